@@ -1,8 +1,35 @@
 #!/usr/bin/env python3
 """Check and fix Surge config for invalid lines"""
+import mmap
 import os
+import shutil
 import sys
 
+def iter_config_lines(surge_path):
+    """Yield (start, end, line) for each line of the config, scanned via mmap"""
+    with open(surge_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            for raw in iter(mm.readline, b''):
+                end = start + len(raw)
+                yield start, end, raw.decode('utf-8')
+                start = end
+
+def apply_line_edits(surge_path, edits):
+    """Return config bytes with the given (start, end, new_line) spans replaced"""
+    pieces = []
+    with open(surge_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            prev = 0
+            for start, end, new_line in edits:
+                pieces.append(mm[prev:start])
+                pieces.append(new_line.encode('utf-8'))
+                prev = end
+            pieces.append(mm[prev:])
+    return b''.join(pieces)
+
 def check_surge_config():
     """Check Surge config for invalid lines"""
     surge_path = os.path.expanduser('~/Library/Mobile Documents/iCloud~com~nssurge~inc/Documents/NyaMiiKo Pro Max plus👑_fixed.conf')
@@ -14,20 +41,17 @@ def check_surge_config():
     print(f"📋 Checking Surge config: {surge_path}")
     print("")
     
-    with open(surge_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
     issues = []
     in_rule_section = False
     
-    for i, line in enumerate(lines, 1):
+    for i, (_, _, line) in enumerate(iter_config_lines(surge_path), 1):
         stripped = line.strip()
         
         # Track [Rule] section
         if stripped == '[Rule]':
             in_rule_section = True
             continue
-        elif stripped.startswith('[') and stripped.endswith(']'):
+        elif stripped[:1] == '[' and stripped[-1:] == ']':
             in_rule_section = False
             continue
         
@@ -71,41 +95,51 @@ def fix_surge_config():
     print(f"🔧 Fixing Surge config: {surge_path}")
     print("")
     
-    with open(surge_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    fixed_count = 0
+    edits = []
     in_rule_section = False
     
-    for i, line in enumerate(lines):
+    for i, (start, end, line) in enumerate(iter_config_lines(surge_path)):
         stripped = line.strip()
         
         # Track [Rule] section
         if stripped == '[Rule]':
             in_rule_section = True
             continue
-        elif stripped.startswith('[') and stripped.endswith(']'):
+        elif stripped[:1] == '[' and stripped[-1:] == ']':
             in_rule_section = False
             continue
         
         # Fix invalid lines in [Rule] section
         if in_rule_section and stripped and not stripped.startswith('#'):
             if 'reddit' in stripped.lower() and 'DOMAIN-KEYWORD' in stripped and ',Reddit' in stripped:
-                lines[i] = line.replace(',Reddit', ',🌐 社交媒体 📱')
-                fixed_count += 1
+                edits.append((start, end, line.replace(',Reddit', ',🌐 社交媒体 📱')))
                 print(f"✅ Fixed line {i+1}: Reddit → 🌐 社交媒体 📱")
     
+    fixed_count = len(edits)
     if fixed_count > 0:
-        # Backup original
+        content = apply_line_edits(surge_path, edits)
+        
+        # Resolve symlinks so the replace below updates the real profile
+        # instead of swapping the link for a regular file
+        surge_path = os.path.realpath(surge_path)
+        
+        # Backup original as a hardlink: the fixed file is swapped in as a
+        # new inode below, so the backup keeps the old content without a copy
         backup_path = surge_path + '.backup'
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            with open(surge_path, 'r', encoding='utf-8') as orig:
-                f.write(orig.read())
+        if os.path.lexists(backup_path):
+            os.remove(backup_path)
+        try:
+            os.link(surge_path, backup_path)
+        except OSError:
+            shutil.copyfile(surge_path, backup_path)
         print(f"📦 Backup saved: {backup_path}")
         
-        # Write fixed config
-        with open(surge_path, 'w', encoding='utf-8') as f:
-            f.writelines(lines)
+        # Write fixed config to a temp file and atomically replace the original
+        tmp_path = surge_path + '.tmp'
+        with open(tmp_path, 'wb', buffering=1 << 20) as f:
+            f.write(content)
+        shutil.copymode(surge_path, tmp_path)
+        os.replace(tmp_path, surge_path)
         
         print(f"✅ Fixed {fixed_count} line(s)")
         return True
@@ -12,110 +12,145 @@ Created: 2025-12-07
 """
 
 import argparse
+import mmap
 import os
 import re
 import sqlite3
 import sys
 from datetime import datetime
+from pathlib import Path
+
+# Section header lines, e.g. "[Rule]" (surrounding whitespace ignored)
+SECTION_HEADER_RE = re.compile(rb'(?m)^[ \t]*(\[[^\r\n]*?)[ \t]*\r?$')
+# RULE-SET lines; group 1 is everything after "RULE-SET,"
+RULE_SET_LINE_RE = re.compile(rb'(?m)^[ \t]*RULE-SET,([^\r\n]*)')
+SKIP_RULE_SETS = frozenset(('SYSTEM', 'LAN'))
+# Updates merged into one CASE statement (3 bound params each, SQLite's
+# default limit is 999); larger batches fall back to executemany
+MAX_MERGED_UPDATES = 300
+
+# Default locations, resolved once at import
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+SHADOWROCKET_ICLOUD_DIR = os.path.expanduser(
+    "~/Library/Mobile Documents/iCloud~com~liguangming~Shadowrocket/Documents"
+)
+DEFAULT_SURGE_CONFIG = os.path.join(REPO_ROOT, "ruleset/Sources/surge_rules_complete.conf")
+
+
+def _open_db(db_path):
+    """Open Shadowrocket database with write-friendly PRAGMAs"""
+    conn = sqlite3.connect(db_path)
+    # Connection-scoped settings only: journal_mode=WAL would be stored in
+    # the db file, and the Shadowrocket app shares this iCloud-synced db
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    return conn
+
+
+def _open_db_readonly(db_path):
+    """Open Shadowrocket database read-only (no PRAGMAs, nothing written)"""
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
 
 
 def parse_surge_rules(surge_config_path):
-    """Parse RULE-SET entries from Surge config file"""
-    rules = []
-    
-    with open(surge_config_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    in_rule_section = False
+    """Parse RULE-SET entries from Surge config file, keyed by URL (last wins)"""
+    rules = {}
     
-    for line in lines:
-        line = line.strip()
-        
-        # Detect [Rule] section
-        if line == '[Rule]':
-            in_rule_section = True
-            continue
-        
-        # Detect other sections
-        if line.startswith('[') and line != '[Rule]':
-            in_rule_section = False
-            continue
-        
-        # Skip empty lines and comments
-        if not in_rule_section or not line or line.startswith('#'):
-            continue
-        
-        # Parse RULE-SET entries
-        # Format: RULE-SET,URL,POLICY,options...
-        if line.startswith('RULE-SET,'):
-            parts = line.split(',')
-            if len(parts) >= 3:
-                url = parts[1].strip()
-                policy = parts[2].strip()
-                
-                # Skip built-in rules (SYSTEM, LAN)
-                if url in ['SYSTEM', 'LAN']:
+    with open(surge_config_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return rules
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Section headers delimit the spans scanned for RULE-SET lines
+            headers = list(SECTION_HEADER_RE.finditer(mm))
+            for i, header in enumerate(headers):
+                if header.group(1) != b'[Rule]':
                     continue
-                
-                # Collect options (everything after policy)
-                options = []
-                for opt in parts[3:]:
-                    opt = opt.strip()
-                    if opt:
-                        options.append(opt)
-                
-                # Build option string for Shadowrocket
-                # Format: POLICY,pre-matching,extended-matching,update-interval=86400,no-resolve
-                option_str = policy
-                if options:
-                    option_str += ',' + ','.join(options)
-                
-                rules.append({
-                    'url': url,
-                    'policy': policy,
-                    'options': option_str,
-                    'raw': line
-                })
+                end = headers[i + 1].start() if i + 1 < len(headers) else len(mm)
+                for match in RULE_SET_LINE_RE.finditer(mm, header.end(), end):
+                    rule = _parse_rule_set(match.group(1).decode('utf-8'))
+                    if rule:
+                        rules[rule['url']] = rule
     
     return rules
 
 
-def get_shadowrocket_rules(db_path):
+def _parse_rule_set(line):
+    """Parse one RULE-SET line body (text after 'RULE-SET,')"""
+    line = line.rstrip()
+    
+    # Format: RULE-SET,URL,POLICY,options...
+    url, sep, tail = line.partition(',')
+    if not sep:
+        return None
+    url = url.strip()
+    
+    # Skip built-in rules (SYSTEM, LAN)
+    if url in SKIP_RULE_SETS:
+        return None
+    
+    # Build option string for Shadowrocket (policy followed by options)
+    # Format: POLICY,pre-matching,extended-matching,update-interval=86400,no-resolve
+    policy, _, opts = tail.partition(',')
+    policy = policy.strip()
+    if opts and (' ' in opts or '\t' in opts or ',,' in opts or opts[-1] == ','):
+        # Slow path: normalize whitespace and drop empty options
+        options = [opt.strip() for opt in opts.split(',')]
+        option_str = ','.join([policy] + [opt for opt in options if opt])
+    elif opts:
+        option_str = policy + ',' + opts
+    else:
+        option_str = policy
+    
+    return {
+        'url': url,
+        'policy': policy,
+        'options': option_str,
+        'raw': 'RULE-SET,' + line
+    }
+
+
+def get_shadowrocket_rules(conn):
     """Get existing RULE-SET entries from Shadowrocket database"""
     rules = {}
     
-    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    # Query config_content table for Rule entries
-    cursor.execute("""
-        SELECT docid, c0section, c1name, c2value, c3option, c5remarks
-        FROM config_content
-        WHERE c0section = 'Rule' AND c1name = 'RULE-SET'
-    """)
-    
-    for row in cursor.fetchall():
-        docid, section, name, url, option, remarks = row
+    # Query config_content table for Rule entries; MATCH narrows the rows
+    # via the FTS index, the equality checks keep the result exact
+    try:
+        cursor.execute("""
+            SELECT docid, c2value, c3option, c5remarks
+            FROM config_content
+            WHERE config_content MATCH 'c0section:Rule c1name:"RULE-SET"'
+              AND c0section = 'Rule' AND c1name = 'RULE-SET'
+        """)
+    except sqlite3.OperationalError:
+        cursor.execute("""
+            SELECT docid, c2value, c3option, c5remarks
+            FROM config_content
+            WHERE c0section = 'Rule' AND c1name = 'RULE-SET'
+        """)
+    
+    for docid, url, option, remarks in cursor.fetchall():
         rules[url] = {
             'docid': docid,
-            'section': section,
-            'name': name,
+            'section': 'Rule',
+            'name': 'RULE-SET',
             'url': url,
             'option': option,
             'remarks': remarks
         }
     
-    conn.close()
     return rules
 
 
-def get_max_docid(db_path):
+def get_max_docid(conn):
     """Get maximum docid from config_content table"""
-    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT MAX(docid) FROM config_content")
     result = cursor.fetchone()[0]
-    conn.close()
     return result or 0
 
 
@@ -132,42 +167,38 @@ def sync_rules(surge_config_path, db_path, dry_run=False, verbose=False):
     print(f"      Found {len(surge_rules)} RULE-SET entries")
     
     # Get existing Shadowrocket rules
+    # Read-only connection; the write connection is opened only if needed
     print("\n[2/4] Reading Shadowrocket database...")
-    sr_rules = get_shadowrocket_rules(db_path)
+    conn = _open_db_readonly(db_path)
+    try:
+        sr_rules = get_shadowrocket_rules(conn)
+    finally:
+        conn.close()
     print(f"      Found {len(sr_rules)} existing RULE-SET entries")
     
     # Calculate differences
     print("\n[3/4] Calculating differences...")
     
-    surge_urls = {r['url'] for r in surge_rules}
-    sr_urls = set(sr_rules.keys())
-    
     to_add = []
     to_update = []
-    to_delete = []
     
     # Find rules to add or update
-    for rule in surge_rules:
-        url = rule['url']
-        if url not in sr_urls:
+    for rule in surge_rules.values():
+        existing = sr_rules.get(rule['url'])
+        if existing is None:
             to_add.append(rule)
-        else:
-            # Check if options changed
-            existing = sr_rules[url]
-            if existing['option'] != rule['options']:
-                to_update.append({
-                    'docid': existing['docid'],
-                    'url': url,
-                    'old_option': existing['option'],
-                    'new_option': rule['options']
-                })
+        elif existing['option'] != rule['options']:
+            # Options changed
+            to_update.append({
+                'docid': existing['docid'],
+                'url': existing['url'],
+                'old_option': existing['option'],
+                'new_option': rule['options']
+            })
     
     # Find rules to delete (in Shadowrocket but not in Surge)
     # Skip built-in rules and local rules
-    skip_delete = {'SYSTEM', 'LAN'}
-    for url in sr_urls:
-        if url not in surge_urls and url not in skip_delete:
-            to_delete.append(sr_rules[url])
+    to_delete = [sr_rules[url] for url in sr_rules.keys() - surge_rules.keys() - SKIP_RULE_SETS]
     
     # Report differences
     print(f"\n      Rules to ADD:    {len(to_add)}")
@@ -204,36 +235,54 @@ def sync_rules(surge_config_path, db_path, dry_run=False, verbose=False):
         print("      (No actual changes made)")
         return True
     
-    conn = sqlite3.connect(db_path)
+    # Build row parameters up front so the write lock is held only for SQL
+    created = datetime.now().isoformat()
+    add_rows = [(rule['url'], rule['options'], created) for rule in to_add]
+    update_rows = [(rule['new_option'], rule['docid']) for rule in to_update]
+    delete_rows = [(rule['docid'],) for rule in to_delete]
+    
+    conn = _open_db(db_path)
     cursor = conn.cursor()
     
     try:
+        # Apply all writes in a single transaction
+        cursor.execute("BEGIN IMMEDIATE")
+        
         # Get next docid
-        next_docid = get_max_docid(db_path) + 1
+        next_docid = get_max_docid(conn) + 1
         
         # Add new rules
-        for rule in to_add:
-            cursor.execute("""
-                INSERT INTO config_content 
-                (docid, c0section, c1name, c2value, c3option, c4ext, c5remarks, c6created)
-                VALUES (?, 'Rule', 'RULE-SET', ?, ?, '', '', ?)
-            """, (next_docid, rule['url'], rule['options'], datetime.now().isoformat()))
-            next_docid += 1
+        cursor.executemany("""
+            INSERT INTO config_content 
+            (docid, c0section, c1name, c2value, c3option, c4ext, c5remarks, c6created)
+            VALUES (?, 'Rule', 'RULE-SET', ?, ?, '', '', ?)
+        """, [(docid,) + row for docid, row in enumerate(add_rows, start=next_docid)])
         
         # Update existing rules
-        for rule in to_update:
-            cursor.execute("""
+        if 1 < len(update_rows) <= MAX_MERGED_UPDATES:
+            # Last option wins per docid, as with sequential UPDATEs
+            merged = {docid: option for option, docid in update_rows}
+            cases = ' '.join(['WHEN ? THEN ?'] * len(merged))
+            marks = ','.join(['?'] * len(merged))
+            params = [value for item in merged.items() for value in item]
+            params += list(merged)
+            cursor.execute(f"""
+                UPDATE config_content
+                SET c3option = CASE docid {cases} END
+                WHERE docid IN ({marks})
+            """, params)
+        else:
+            cursor.executemany("""
                 UPDATE config_content
                 SET c3option = ?
                 WHERE docid = ?
-            """, (rule['new_option'], rule['docid']))
+            """, update_rows)
         
         # Delete removed rules
-        for rule in to_delete:
-            cursor.execute("""
-                DELETE FROM config_content
-                WHERE docid = ?
-            """, (rule['docid'],))
+        cursor.executemany("""
+            DELETE FROM config_content
+            WHERE docid = ?
+        """, delete_rows)
         
         conn.commit()
         print(f"      Added:   {len(to_add)} rules")
@@ -256,38 +305,31 @@ def sync_rules(surge_config_path, db_path, dry_run=False, verbose=False):
 
 def find_shadowrocket_db():
     """Find Shadowrocket database in iCloud"""
-    icloud_base = os.path.expanduser(
-        "~/Library/Mobile Documents/iCloud~com~liguangming~Shadowrocket/Documents"
-    )
+    icloud_base = SHADOWROCKET_ICLOUD_DIR
     
-    if not os.path.exists(icloud_base):
+    # Single directory pass: prefer a SURGE-related db, else the first .db
+    any_db = None
+    try:
+        with os.scandir(icloud_base) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.db'):
+                    continue
+                if 'SURGE' in entry.name.upper():
+                    return entry.path
+                if any_db is None:
+                    any_db = entry.path
+    except (FileNotFoundError, NotADirectoryError):
         return None
     
-    # Find .db files
-    for filename in os.listdir(icloud_base):
-        if filename.endswith('.db') and 'SURGE' in filename.upper():
-            return os.path.join(icloud_base, filename)
-    
-    # If no SURGE-related db found, look for any .db file
-    for filename in os.listdir(icloud_base):
-        if filename.endswith('.db'):
-            return os.path.join(icloud_base, filename)
-    
-    return None
+    return any_db
 
 
 def get_default_paths():
     """Get default configuration file paths"""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    repo_root = os.path.dirname(os.path.dirname(script_dir))
-    
-    # Surge rules source
-    surge_config = os.path.join(repo_root, "ruleset/Sources/surge_rules_complete.conf")
-    
     # Shadowrocket database
     sr_db = find_shadowrocket_db()
     
-    return surge_config, sr_db
+    return DEFAULT_SURGE_CONFIG, sr_db
 
 
 if __name__ == '__main__':
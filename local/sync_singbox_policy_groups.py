@@ -11,49 +11,138 @@ import argparse
 import json
 import os
 import re
+import shutil
 import sys
 
+try:
+    import ijson  # 可选: 流式解析, 无变更时不必加载整个Singbox配置
+except ImportError:
+    ijson = None
+
+try:
+    import orjson  # 可选: 加速Singbox配置的读取和保存
+except ImportError:
+    orjson = None
+
+GROUP_OUTBOUND_TYPES = ('selector', 'urltest')
+
+# Surge策略组类型 (与原先逐个startswith检测等价)
+GROUP_TYPE_RE = re.compile(r'(select|url-test|fallback|load-balance|smart)')
+
+# 默认路径, 导入时计算一次
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))  # Go up 2 levels
+ICLOUD_SURGE_CONFIG = os.path.expanduser(
+    "~/Library/Mobile Documents/iCloud~com~nssurge~inc/Documents/NyaMiiKo Pro Max plus👑_fixed.conf"
+)
+TEMPLATE_SURGE_CONFIG = os.path.join(REPO_ROOT, "ruleset/Sources/conf/surge_profile_template.conf")
+DEFAULT_SINGBOX_CONFIG = os.path.join(REPO_ROOT, "substore/Singbox_substore_1.13.0+.json")
+
 def parse_surge_policy_groups(surge_config_path):
     """解析Surge配置文件中的策略组"""
     policy_groups = {}
     
-    with open(surge_config_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    # 一次性读取并解码, 避免逐块增量解码
+    with open(surge_config_path, 'rb', buffering=1 << 20) as f:
+        text = f.read().decode('utf-8')
+    lines = text.splitlines()
     
+    # 剩余可能的[Proxy Group]标题数 (子串计数只会多不会少);
+    # 归零后离开该部分即可提前结束, 不再扫描后面的[Rule]等部分
+    pending_sections = text.count('[Proxy Group]')
     in_proxy_group = False
     
     for line in lines:
         line = line.strip()
         
-        # 检测[Proxy Group]部分
-        if line == '[Proxy Group]':
-            in_proxy_group = True
+        # 跳过空行
+        if not line:
             continue
         
-        # 检测其他section开始
-        if line.startswith('[') and line != '[Proxy Group]':
-            in_proxy_group = False
+        # 检测[Proxy Group]部分, 其他section开始即结束
+        if line[0] == '[':
+            if in_proxy_group and not pending_sections:
+                break
+            in_proxy_group = line == '[Proxy Group]'
+            if in_proxy_group:
+                pending_sections -= 1
             continue
         
-        # 跳过空行和注释
-        if not in_proxy_group or not line or line.startswith('#'):
+        # 跳过注释
+        if not in_proxy_group or line[0] == '#':
             continue
         
         # 解析策略组定义 - 更宽松的匹配
-        if '=' in line:
-            parts = line.split('=', 1)
-            if len(parts) == 2:
-                group_name = parts[0].strip()
-                config = parts[1].strip()
-                
-                # 检测策略组类型
-                for group_type in ['select', 'url-test', 'fallback', 'load-balance', 'smart']:
-                    if config.startswith(group_type):
-                        policy_groups[group_name] = group_type
-                        break
+        group_name, sep, config = line.partition('=')
+        if sep:
+            group_name = group_name.strip()
+            config = config.strip()
+            
+            # 检测策略组类型
+            match = GROUP_TYPE_RE.match(config)
+            if match:
+                policy_groups[group_name] = match.group(1)
     
     return policy_groups
 
+def load_singbox_config(singbox_config_path):
+    """完整读取Singbox配置"""
+    if orjson is not None:
+        with open(singbox_config_path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(singbox_config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_singbox_group_tags(singbox_config_path):
+    """读取Singbox配置中现有策略组的tag集合
+
+    返回 (tags, config); 流式解析时 config 为 None, 需要写入时再完整加载
+    """
+    if ijson is None:
+        singbox_config = load_singbox_config(singbox_config_path)
+        tags = {o['tag'] for o in singbox_config.get('outbounds', [])
+                if o.get('type') in GROUP_OUTBOUND_TYPES}
+        return tags, singbox_config
+    
+    # 只流式读取 outbounds[].type / outbounds[].tag
+    tags = set()
+    outbound_type = outbound_tag = None
+    with open(singbox_config_path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, buf_size=64 * 1024):
+            if prefix == 'outbounds.item':
+                if event == 'start_map':
+                    outbound_type = outbound_tag = None
+                elif event == 'end_map' and outbound_type in GROUP_OUTBOUND_TYPES:
+                    tags.add(outbound_tag)
+            elif prefix == 'outbounds.item.type':
+                outbound_type = value
+            elif prefix == 'outbounds.item.tag':
+                outbound_tag = value
+    return tags, None
+
+def save_singbox_config(singbox_config, output_file):
+    """保存Singbox配置 (UTF-8, 缩进2), 先写临时文件再原子替换"""
+    tmp_file = output_file + '.tmp'
+    try:
+        if orjson is not None:
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(singbox_config, option=orjson.OPT_INDENT_2))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(singbox_config, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+        # 保留原文件的权限
+        if os.path.exists(output_file):
+            shutil.copymode(output_file, tmp_file)
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
 def create_singbox_outbound(name, group_type, default_outbound="🎯 全球直连"):
     """创建Singbox outbound配置"""
     
@@ -95,14 +184,8 @@ def sync_policy_groups(surge_config_path, singbox_config_path, output_path=None,
     print(f"   找到 {len(surge_groups)} 个Surge策略组")
     
     print("\n📖 读取Singbox配置...")
-    with open(singbox_config_path, 'r', encoding='utf-8') as f:
-        singbox_config = json.load(f)
-    
     # 提取现有的Singbox策略组
-    existing_groups = {}
-    for outbound in singbox_config.get('outbounds', []):
-        if outbound.get('type') in ['selector', 'urltest']:
-            existing_groups[outbound['tag']] = outbound
+    existing_groups, singbox_config = load_singbox_group_tags(singbox_config_path)
     
     print(f"   找到 {len(existing_groups)} 个Singbox策略组")
     
@@ -127,6 +210,10 @@ def sync_policy_groups(surge_config_path, singbox_config_path, output_path=None,
             print(f"   + {name} ({group_type})")
         return
     
+    # 仅在需要写入时加载完整配置
+    if singbox_config is None:
+        singbox_config = load_singbox_config(singbox_config_path)
+    
     # 添加缺失的策略组
     print("\n➕ 添加缺失的策略组...")
     for name, group_type in missing_groups:
@@ -137,34 +224,26 @@ def sync_policy_groups(surge_config_path, singbox_config_path, output_path=None,
     # 保存配置
     output_file = output_path or singbox_config_path
     print(f"\n💾 保存配置到: {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(singbox_config, f, ensure_ascii=False, indent=2)
+    save_singbox_config(singbox_config, output_file)
     
     print("\n✅ 策略组同步完成！")
     print(f"   总策略组数: {len(singbox_config['outbounds'])}")
 
 def get_script_dir():
     """获取脚本所在目录"""
-    return os.path.dirname(os.path.abspath(__file__))
+    return SCRIPT_DIR
 
 def get_default_paths():
     """获取默认配置文件路径"""
-    script_dir = get_script_dir()
-    repo_root = os.path.dirname(os.path.dirname(script_dir))  # Go up 2 levels
-    
     # Surge配置 - 从iCloud读取完整配置（包含[Proxy Group]）
-    surge_config = os.path.expanduser(
-        "~/Library/Mobile Documents/iCloud~com~nssurge~inc/Documents/NyaMiiKo Pro Max plus👑_fixed.conf"
-    )
+    surge_config = ICLOUD_SURGE_CONFIG
     
     # 如果iCloud配置不存在，尝试使用本地模板
     if not os.path.exists(surge_config):
-        surge_config = os.path.join(repo_root, "ruleset/Sources/conf/surge_profile_template.conf")
+        surge_config = TEMPLATE_SURGE_CONFIG
     
     # Singbox模板
-    singbox_config = os.path.join(repo_root, "substore/Singbox_substore_1.13.0+.json")
-    
-    return surge_config, singbox_config
+    return surge_config, DEFAULT_SINGBOX_CONFIG
 
 if __name__ == '__main__':
     default_surge, default_singbox = get_default_paths()
@@ -4,17 +4,38 @@ Singbox Configuration Audit Tool
 Comprehensive review of Singbox config logic and structure
 """
 import json
+import re
 import sys
 from collections import defaultdict
 
+try:
+    import orjson  # optional: faster JSON parsing
+except ImportError:
+    orjson = None
+
+# Rule-set categories, checked in order; each keyword list is one compiled alternation
+RULESET_CATEGORIES = [
+    ('Ad Blocking', re.compile(r'adblock')),
+    ('Streaming', re.compile(r'stream|youtube|spotify|netflix|disney')),
+    ('Social & AI', re.compile(r'ai|telegram|tiktok|socialmedia|twitter|reddit')),
+    ('Tech Giants', re.compile(r'apple|google|microsoft|github')),
+    ('Gaming', re.compile(r'gaming|steam|epic')),
+    ('China Services', re.compile(r'china|tencent|bilibili|xiaohongshu|neteasemusic')),
+    ('Network & Direct', re.compile(r'lan|cdn|manual|direct|download')),
+]
+
 def audit_singbox_config(filepath):
     """Audit Singbox configuration for logic and consistency"""
     print(f"\n{'='*70}")
     print(f"Auditing: {filepath}")
     print(f"{'='*70}\n")
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    if orjson is not None:
+        with open(filepath, 'rb') as f:
+            config = orjson.loads(f.read())
+    else:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            config = json.load(f)
     
     # 1. Rule-set definitions audit
     print("📋 1. RULE-SET DEFINITIONS AUDIT")
@@ -31,22 +52,13 @@ def audit_singbox_config(filepath):
     categories = defaultdict(list)
     for rs in rulesets:
         tag = rs.get('tag', '')
-        if 'adblock' in tag.lower():
-            categories['Ad Blocking'].append(tag)
-        elif any(x in tag.lower() for x in ['stream', 'youtube', 'spotify', 'netflix', 'disney']):
-            categories['Streaming'].append(tag)
-        elif any(x in tag.lower() for x in ['ai', 'telegram', 'tiktok', 'socialmedia', 'twitter', 'reddit']):
-            categories['Social & AI'].append(tag)
-        elif any(x in tag.lower() for x in ['apple', 'google', 'microsoft', 'github']):
-            categories['Tech Giants'].append(tag)
-        elif any(x in tag.lower() for x in ['gaming', 'steam', 'epic']):
-            categories['Gaming'].append(tag)
-        elif any(x in tag.lower() for x in ['china', 'tencent', 'bilibili', 'xiaohongshu', 'neteasemusic']):
-            categories['China Services'].append(tag)
-        elif any(x in tag.lower() for x in ['lan', 'cdn', 'manual', 'direct', 'download']):
-            categories['Network & Direct'].append(tag)
+        tag_lower = tag.lower()
+        for cat, pattern in RULESET_CATEGORIES:
+            if pattern.search(tag_lower):
+                break
         else:
-            categories['Others'].append(tag)
+            cat = 'Others'
+        categories[cat].append(tag)
     
     for cat, tags in sorted(categories.items()):
         print(f"\n  {cat}: {len(tags)} rule-sets")
@@ -69,11 +81,24 @@ def audit_singbox_config(filepath):
     outbound_usage = defaultdict(int)
     ruleset_usage = defaultdict(int)
     
-    for rule in rules:
+    # Last positions of key rule-sets, for the rule order check in section 6
+    adblock_index = None
+    globalproxy_index = None
+    chinadirect_index = None
+    
+    for i, rule in enumerate(rules):
         # Determine rule type
         if 'rule_set' in rule:
             rule_types['rule_set'] += 1
-            ruleset_usage[rule.get('rule_set', 'unknown')] += 1
+            rs = rule['rule_set']
+            ruleset_usage[rs] += 1
+            rs_lower = rs.lower()
+            if 'adblock' in rs_lower:
+                adblock_index = i
+            elif 'globalproxy' in rs_lower:
+                globalproxy_index = i
+            elif 'chinadirect' in rs_lower:
+                chinadirect_index = i
         elif 'domain' in rule:
             rule_types['domain'] += 1
         elif 'domain_suffix' in rule:
@@ -184,20 +209,7 @@ def audit_singbox_config(filepath):
     
     issues = []
     
-    # Check rule order logic
-    adblock_index = None
-    globalproxy_index = None
-    chinadirect_index = None
-    
-    for i, rule in enumerate(rules):
-        rs = rule.get('rule_set', '')
-        if 'adblock' in rs.lower():
-            adblock_index = i
-        elif 'globalproxy' in rs.lower():
-            globalproxy_index = i
-        elif 'chinadirect' in rs.lower():
-            chinadirect_index = i
-    
+    # Check rule order logic (indices collected in section 2)
     # AdBlock should come before other rules
     if adblock_index is not None and globalproxy_index is not None:
         if adblock_index > globalproxy_index:
@@ -209,8 +221,7 @@ def audit_singbox_config(filepath):
             issues.append("⚠️  ChinaDirect rules should come before GlobalProxy rules")
     
     # Check for duplicate rule-set references
-    ruleset_refs = [r.get('rule_set') for r in rules if 'rule_set' in r]
-    duplicates = {rs: ruleset_refs.count(rs) for rs in set(ruleset_refs) if ruleset_refs.count(rs) > 1}
+    duplicates = {rs: count for rs, count in ruleset_usage.items() if count > 1}
     if duplicates:
         issues.append(f"⚠️  Duplicate rule-set references found: {len(duplicates)}")
         for rs, count in sorted(duplicates.items(), key=lambda x: -x[1])[:5]:
@@ -13,7 +13,9 @@ Surge模块整合脚本
 import os
 import re
 import json
+from itertools import islice
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import quote
 
@@ -21,12 +23,16 @@ from urllib.parse import quote
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 MODULE_DIR = PROJECT_ROOT / "module" / "surge(main)"
+MODULE_DIR_STR = str(MODULE_DIR)  # 扫描时直接用字符串路径拼接
 OUTPUT_DIR = PROJECT_ROOT / "module"
 COMPAT_FILE = OUTPUT_DIR / "modules_compatibility.json"
 
 # GitHub raw URL基础路径
 GITHUB_RAW_BASE = "https://raw.githubusercontent.com/nowaytouse/script_hub/master/module/surge%28main%29"
 
+# 并行解析模块头部的线程数
+SCAN_WORKERS = 32
+
 # 分类定义
 CATEGORIES = {
     "amplify_nexus": {
@@ -59,6 +65,26 @@ TAG_PATTERNS = {
     "shopping": ["淘宝", "京东", "拼多多", "闲鱼"]
 }
 
+# 标签匹配: 每个标签一个前瞻分支, 按TAG_PATTERNS顺序尝试, 保持"先定义的标签优先"
+TAG_RE = re.compile('|'.join(
+    f'(?=.*?(?:{"|".join(map(re.escape, patterns))}))(?P<{tag}>)'
+    for tag, patterns in TAG_PATTERNS.items()
+), re.DOTALL)
+
+# 相关模块组 (按文件名匹配, 数量>=3时提示整合)
+DUPLICATE_GROUPS = {
+    "B站": ("bilibili", "bili"),
+    "YouTube": ("youtube",),
+    "iRingo": ("iringo",),
+    "DNS": ("dns",)
+}
+
+# 模块头部元数据: (行前缀, 字段, 预编译正则), 如 #!name=... / #!desc: ...
+HEADER_PATTERNS = [
+    (f'#!{key}', key, re.compile(rf'#!{key}\s*[=:]\s*(.+)'))
+    for key in ("name", "desc", "author", "version", "date")
+]
+
 
 def sanitize_string(s: str) -> str:
     """清理字符串中的特殊字符，确保JSON安全"""
@@ -75,11 +101,12 @@ def sanitize_string(s: str) -> str:
     return s
 
 
-def get_module_info(filepath: Path) -> dict:
+def get_module_info(filepath: str) -> dict:
     """解析模块文件获取信息"""
+    filename = os.path.basename(filepath)
     info = {
-        "name": filepath.stem,
-        "filename": filepath.name,
+        "name": os.path.splitext(filename)[0],
+        "filename": filename,
         "desc": "",
         "category": "",
         "author": "",
@@ -88,47 +115,34 @@ def get_module_info(filepath: Path) -> dict:
     }
     
     try:
+        # 元数据只在前30行, 不读取整个文件
         with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+            head = list(islice(f, 30))
             
-        for line in content.split('\n')[:30]:
+        for line in head:
             line = line.strip()
-            if line.startswith('#!name'):
-                # 提取名称
-                match = re.search(r'#!name\s*[=:]\s*(.+)', line)
-                if match:
-                    info["name"] = sanitize_string(match.group(1).strip())
-            elif line.startswith('#!desc'):
-                match = re.search(r'#!desc\s*[=:]\s*(.+)', line)
-                if match:
-                    info["desc"] = sanitize_string(match.group(1).strip()[:60])
-            elif line.startswith('#!author'):
-                match = re.search(r'#!author\s*[=:]\s*(.+)', line)
-                if match:
-                    info["author"] = sanitize_string(match.group(1).strip())
-            elif line.startswith('#!version'):
-                match = re.search(r'#!version\s*[=:]\s*(.+)', line)
-                if match:
-                    info["version"] = sanitize_string(match.group(1).strip())
-            elif line.startswith('#!date'):
-                match = re.search(r'#!date\s*[=:]\s*(.+)', line)
-                if match:
-                    info["date"] = sanitize_string(match.group(1).strip())
+            if not line.startswith('#!'):
+                continue
+            for prefix, key, pattern in HEADER_PATTERNS:
+                if line.startswith(prefix):
+                    match = pattern.search(line)
+                    if match:
+                        value = match.group(1).strip()
+                        if key == "desc":
+                            value = value[:60]
+                        info[key] = sanitize_string(value)
+                    break
                     
     except Exception as e:
-        print(f"  ⚠️ 解析失败: {filepath.name} - {e}")
+        print(f"  ⚠️ 解析失败: {filename} - {e}")
         
     return info
 
 
 def get_tag(name: str, filename: str) -> str:
     """根据名称获取标签"""
-    combined = (name + filename).lower()
-    for tag, patterns in TAG_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in combined:
-                return tag
-    return ""
+    match = TAG_RE.match((name + filename).lower())
+    return match.lastgroup if match else ""
 
 
 def is_essential(name: str) -> bool:
@@ -145,33 +159,59 @@ def generate_url(category: str, filename: str) -> str:
     return f"{GITHUB_RAW_BASE}/{category}/{encoded_filename}"
 
 
-def scan_modules() -> dict:
-    """扫描所有模块"""
+def scan_modules() -> tuple:
+    """扫描所有模块, 返回 (modules, stats)
+
+    stats 在扫描时顺带统计: total / tags (标签->数量) / essential
+    """
     modules = {}
+    module_files = []
+    stats = {"total": 0, "tags": {}, "essential": 0}
+    tag_counts = stats["tags"]
     
     for cat_dir in CATEGORIES.keys():
-        cat_path = MODULE_DIR / cat_dir
-        if not cat_path.exists():
+        cat_path = os.path.join(MODULE_DIR_STR, cat_dir)
+        if not os.path.exists(cat_path):
             print(f"  ⚠️ 分类目录不存在: {cat_dir}")
             continue
             
+        category = CATEGORIES[cat_dir]
+        items = []
         modules[cat_dir] = {
-            "name": CATEGORIES[cat_dir]["name"],
-            "desc": CATEGORIES[cat_dir]["desc"],
-            "items": []
+            "name": category["name"],
+            "desc": category["desc"],
+            "items": items
         }
         
-        for module_file in sorted(cat_path.glob("*.sgmodule")):
-            info = get_module_info(module_file)
-            tag = get_tag(info["name"], module_file.name)
-            essential = is_essential(info["name"])
-            url = generate_url(cat_dir, module_file.name)
+        # 记录所属分类的items列表, 解析后直接追加, 不再按key查找
+        with os.scandir(cat_path) as entries:
+            # 与 glob("*.sgmodule") 一致: 跳过点文件 (如 macOS 的 ._foo.sgmodule)
+            names = sorted(e.name for e in entries
+                           if e.name.endswith(".sgmodule") and not e.name.startswith("."))
+        for filename in names:
+            module_files.append((items, cat_dir, filename))
+    
+    # 头部解析是独立的小文件读取, 用线程池重叠I/O (map保持原有顺序)
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        paths = [os.path.join(MODULE_DIR_STR, cat_dir, f) for _, cat_dir, f in module_files]
+        infos = executor.map(get_module_info, paths)
+        
+        for (items, cat_dir, filename), info in zip(module_files, infos):
+            name = info["name"]
+            tag = get_tag(name, filename)
+            essential = is_essential(name)
             
-            modules[cat_dir]["items"].append({
-                "name": info["name"],
-                "filename": module_file.name,
-                "desc": info["desc"] or info["name"],
-                "url": url,
+            stats["total"] += 1
+            if tag:
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+            if essential:
+                stats["essential"] += 1
+            
+            items.append({
+                "name": name,
+                "filename": filename,
+                "desc": info["desc"] or name,
+                "url": generate_url(cat_dir, filename),
                 "tag": tag,
                 "essential": essential,
                 "author": info["author"],
@@ -179,7 +219,7 @@ def scan_modules() -> dict:
                 "date": info["date"]
             })
             
-    return modules
+    return modules, stats
 
 
 # 已删除 generate_url_list 函数 - 用户要求仅更新网页，不再生成URL列表文件
@@ -319,46 +359,35 @@ def generate_helper_js(modules: dict, compat_data: dict) -> str:
 def check_duplicates(modules: dict) -> list:
     """检测重复模块（基于文件名完全匹配）"""
     duplicates = []
-    all_items = []
+    seen_filenames = {}
+    group_counts = dict.fromkeys(DUPLICATE_GROUPS, 0)
     
-    # 收集所有模块
+    # 一次遍历: 文件名只转小写一次, 同时检测同名文件和统计相关模块组
     for cat_key, cat_data in modules.items():
         for item in cat_data["items"]:
-            all_items.append({
-                "name": item["name"],
-                "filename": item["filename"],
-                "cat": cat_key
-            })
-    
-    # 检测完全同名文件（不同分类）
-    seen_filenames = {}
-    for item in all_items:
-        filename = item["filename"].lower()
-        
-        if filename in seen_filenames:
-            prev = seen_filenames[filename]
-            if prev["cat"] != item["cat"]:
+            filename = item["filename"].lower()
+            
+            # 检测完全同名文件（不同分类）
+            prev = seen_filenames.get(filename)
+            if prev is None:
+                seen_filenames[filename] = (item["name"], cat_key)
+            elif prev[1] != cat_key:
                 duplicates.append({
-                    "name1": f"{prev['name']} ({prev['cat']})",
-                    "name2": f"{item['name']} ({item['cat']})",
+                    "name1": f"{prev[0]} ({prev[1]})",
+                    "name2": f"{item['name']} ({cat_key})",
                     "reason": "完全同名文件"
                 })
-        else:
-            seen_filenames[filename] = item
-    
-    # 统计相关模块组
-    groups = {
-        "B站": [i for i in all_items if 'bilibili' in i["filename"].lower() or 'bili' in i["filename"].lower()],
-        "YouTube": [i for i in all_items if 'youtube' in i["filename"].lower()],
-        "iRingo": [i for i in all_items if 'iringo' in i["filename"].lower()],
-        "DNS": [i for i in all_items if 'dns' in i["filename"].lower()]
-    }
+            
+            # 统计相关模块组
+            for group_name, patterns in DUPLICATE_GROUPS.items():
+                if any(p in filename for p in patterns):
+                    group_counts[group_name] += 1
     
-    for group_name, items in groups.items():
-        if len(items) >= 3:
+    for group_name, count in group_counts.items():
+        if count >= 3:
             duplicates.append({
                 "name1": f"{group_name}相关模块",
-                "name2": f"共 {len(items)} 个",
+                "name2": f"共 {count} 个",
                 "reason": "可考虑整合"
             })
                 
@@ -424,6 +453,27 @@ def generate_sr_helper_js(sr_modules: dict) -> str:
     return json.dumps(js_modules, ensure_ascii=False, separators=(',', ':'))
 
 
+def splice_js_const(content: str, name: str, value: str, markers: tuple) -> str:
+    """替换 `const <name> = {...};` 定义 (到紧随其后的某个 marker 行之前)
+
+    等价于 re.sub(r'const <name> = \{.*?\};\s*(?=\n(?:markers))', ..., flags=re.DOTALL),
+    但只用 str.find 定位边界, 不对整个网页做正则扫描
+    """
+    start = content.find(f'const {name} = {{')
+    if start < 0:
+        return content
+    
+    pos = start
+    while True:
+        ends = [i for i in (content.find(f'\n{m}', pos) for m in markers) if i >= 0]
+        if not ends:
+            return content
+        end = min(ends)
+        if content[start:end].rstrip().endswith('};'):
+            return f'{content[:start]}const {name} = {value};\n{content[end:]}'
+        pos = end + 1
+
+
 def update_helper_html(modules: dict, compat_data: dict):
     """更新助手网页中的模块数据"""
     helper_path = OUTPUT_DIR / "surge_module_helper.html"
@@ -443,10 +493,9 @@ def update_helper_html(modules: dict, compat_data: dict):
         sr_modules = load_shadowrocket_modules()
         sr_js_data = generate_sr_helper_js(sr_modules) if sr_modules else "{}"
         
-        # 替换Surge模块数据 - 使用更精确的正则
-        surge_pattern = r'const surgeModules = \{.*?\};\s*(?=\n(?:const srModules|let copiedModules))'
-        surge_replacement = f'const surgeModules = {surge_js_data};\n'
-        new_content = re.sub(surge_pattern, surge_replacement, content, flags=re.DOTALL)
+        # 替换Surge模块数据
+        new_content = splice_js_const(content, 'surgeModules', surge_js_data,
+                                      ('const srModules', 'let copiedModules'))
         
         # 检查是否已有srModules定义
         if 'const srModules = ' not in new_content:
@@ -457,9 +506,8 @@ def update_helper_html(modules: dict, compat_data: dict):
             )
         else:
             # 替换现有的srModules
-            sr_pattern = r'const srModules = \{.*?\};\s*(?=\nlet copiedModules)'
-            sr_replacement = f'const srModules = {sr_js_data};\n'
-            new_content = re.sub(sr_pattern, sr_replacement, new_content, flags=re.DOTALL)
+            new_content = splice_js_const(new_content, 'srModules', sr_js_data,
+                                          ('let copiedModules',))
         
         with open(helper_path, 'w', encoding='utf-8') as f:
             f.write(new_content)
@@ -480,9 +528,9 @@ def main():
     
     # 扫描模块
     print("🔍 扫描模块...")
-    modules = scan_modules()
+    modules, stats = scan_modules()
     
-    total = sum(len(cat["items"]) for cat in modules.values())
+    total = stats["total"]
     print(f"  找到 {total} 个模块")
     print()
     
@@ -516,7 +564,8 @@ def main():
     # 生成JSON数据
     print("💾 生成JSON数据...")
     json_path = OUTPUT_DIR / "modules_data.json"
-    with open(json_path, 'w', encoding='utf-8') as f:
+    # json.dump 逐块写入, 大缓冲区合并为少量系统调用
+    with open(json_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
         json.dump({
             "generated": datetime.now().isoformat(),
             "total": total,
@@ -527,18 +576,9 @@ def main():
     
     # 统计标签
     print("🏷️ 标签统计:")
-    tag_counts = {}
-    essential_count = 0
-    for cat_data in modules.values():
-        for item in cat_data["items"]:
-            if item["tag"]:
-                tag_counts[item["tag"]] = tag_counts.get(item["tag"], 0) + 1
-            if item["essential"]:
-                essential_count += 1
-                
-    for tag, count in sorted(tag_counts.items(), key=lambda x: -x[1]):
+    for tag, count in sorted(stats["tags"].items(), key=lambda x: -x[1]):
         print(f"  {tag}: {count}")
-    print(f"  ⭐ 必装: {essential_count}")
+    print(f"  ⭐ 必装: {stats['essential']}")
     print()
     
     print("=" * 60)
@@ -5,26 +5,29 @@ from datetime import datetime
 
 RULESET_DIR = "ruleset/Surge(Shadowkroket)"
 
-def read_rules(filepath):
-    rules = set()
+def read_rules(filepath, rules=None):
+    """Add rules from filepath to rules (raw bytes, decoded on write)"""
+    if rules is None:
+        rules = set()
     if not os.path.exists(filepath):
         return rules
-    with open(filepath, 'r') as f:
+    with open(filepath, 'rb') as f:
         for line in f:
             line = line.strip()
-            if not line or line.startswith('#'):
+            if not line or line[:1] == b'#':
                 continue
             rules.add(line)
     return rules
 
 def write_ruleset(filepath, rules, name):
     sorted_rules = sorted(rules)
-    with open(filepath, 'w') as f:
-        f.write(f"# Ruleset: {name}\n")
-        f.write(f"# Updated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
-        f.write(f"# Rules: {len(sorted_rules)}\n\n")
-        for rule in sorted_rules:
-            f.write(rule + '\n')
+    header = (f"# Ruleset: {name}\n"
+              f"# Updated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
+              f"# Rules: {len(sorted_rules)}\n\n")
+    # Join once and write once instead of one write per rule
+    body = b'\n'.join(sorted_rules) + b'\n' if sorted_rules else b''
+    with open(filepath, 'wb') as f:
+        f.write(header.encode('utf-8') + body)
 
 def merge(target, sources):
     target_path = os.path.join(RULESET_DIR, target)
@@ -33,9 +36,8 @@ def merge(target, sources):
     
     for src in sources:
         src_path = os.path.join(RULESET_DIR, src)
-        src_rules = read_rules(src_path)
         before = len(all_rules)
-        all_rules.update(src_rules)
+        read_rules(src_path, all_rules)
         print(f"  + {src}: +{len(all_rules)-before} new")
     
     write_ruleset(target_path, all_rules, target.replace('.list',''))
@@ -12,8 +12,16 @@ import os
 import re
 import json
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
+from urllib.parse import quote
+
+try:
+    import orjson  # 可选: 见 write_json
+except ImportError:
+    orjson = None
 
 # 项目根目录
 SCRIPT_DIR = Path(__file__).parent
@@ -89,108 +97,181 @@ SCRIPT_CONVERSIONS = {
     # 如果有特定脚本需要转换，在这里添加
 }
 
+# 预编译正则，避免逐行重复解析模式
+REMOVE_RES = [re.compile(p, re.IGNORECASE) for p in REMOVE_PATTERNS]
+FEATURE_RES = {
+    feature: (
+        re.compile(rf',\s*{re.escape(feature)}'),
+        re.compile(rf'{re.escape(feature)}\s*,'),
+        re.compile(re.escape(feature)),
+    )
+    for feature in ("extended-matching", "pre-matching")
+}
+# 拒绝类型与追加/插入标记：一次扫描完成全部替换
+MARKER_REPLACEMENTS = {k: v for k, v in CONVERSION_RULES.items() if k not in FEATURE_RES}
+MARKER_RE = re.compile('|'.join(re.escape(k) for k in MARKER_REPLACEMENTS))
+COMMA_COLLAPSE_RE = re.compile(r',\s*,')
+TRAILING_COMMA_RE = re.compile(r',\s*$')
+LEADING_COMMA_RE = re.compile(r'^\s*,')
+PLACEHOLDER_RE = re.compile(r'\{\{\{([^}]+)\}\}\}')
+SKIP_DNS_RES = [re.compile(p) for p in SKIP_DNS_CONVERSION_PATTERNS]
+DNS_CONVERSION_RES = [(re.compile(p), r) for p, r in DNS_CONVERSION_PATTERNS]
+
+# 网页数据：模块头部的名称和描述（[^\S\n] 保证不跨行匹配）
+NAME_LINE_RE = re.compile(r'^#!name[^\S\n]*[=:][^\S\n]*(.+)', re.MULTILINE)
+DESC_LINE_RE = re.compile(r'^#!desc[^\S\n]*[=:][^\S\n]*(.+)', re.MULTILINE)
+
+# 网页中的模块数据变量
+SR_MODULES_VAR_RE = re.compile(r'const srModules = \{[^;]*\};', re.DOTALL)
+MODULES_VAR_RE = re.compile(r'(const modules = \{[^;]*\};)', re.DOTALL)
+
+
+def write_json(path, data):
+    """以 indent=2 写出JSON（有orjson时用orjson，浮点数指数写法可能不同，如 1e+20 与 1e20）"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _replace_marker(match):
+    return MARKER_REPLACEMENTS[match.group(0)]
+
+
+def _split_lines(lines):
+    """按 content.split('\\n') 的语义逐行产出（去掉行尾换行，末尾换行后补一个空行）"""
+    line = ''
+    for line in lines:
+        if line.endswith('\n'):
+            yield line[:-1]
+        else:
+            yield line
+    if not line or line.endswith('\n'):
+        yield ''
+
+
+def tag_desc_line(line: str) -> str:
+    """在 #!desc = xxx 的描述值前插入 [🚀SR] 标记，描述为空时原样返回"""
+    rest = line[len('#!desc'):].lstrip()
+    if rest[:1] not in ('=', ':'):
+        return line
+    value = rest[1:].lstrip()
+    if not value:
+        return line
+    return line[:len(line) - len(value)] + '[🚀SR] ' + value
+
 
-def convert_module_content(content: str, filename: str) -> tuple[str, list]:
+def convert_lines(lines, changes: list):
     """
-    转换模块内容为Shadowrocket兼容格式
-    返回: (转换后内容, 转换记录列表)
+    逐行转换模块内容为Shadowrocket兼容格式（生成器，可直接交给writelines）
+    转换记录追加到 changes 列表
     """
-    changes = []
-    lines = content.split('\n')
-    new_lines = []
+    first = True
     
-    for line in lines:
+    for line in _split_lines(lines):
         original_line = line
-        modified = False
         
-        # 检查是否需要移除整行
-        should_remove = False
-        for pattern in REMOVE_PATTERNS:
-            if re.match(pattern, line.strip(), re.IGNORECASE):
-                should_remove = True
-                changes.append(f"移除: {line.strip()[:50]}")
-                break
-        
-        if should_remove:
-            continue
+        # 检查是否需要移除整行（移除模式都以#!开头，其余行直接跳过）
+        stripped = line.strip()
+        if stripped.startswith('#!'):
+            should_remove = False
+            for pattern in REMOVE_RES:
+                if pattern.match(stripped):
+                    should_remove = True
+                    changes.append(f"移除: {stripped[:50]}")
+                    break
+            
+            if should_remove:
+                continue
         
-        # 应用转换规则
-        for surge_feature, sr_replacement in CONVERSION_RULES.items():
-            if surge_feature in line:
-                # 特殊处理规则类型
-                if surge_feature in ["extended-matching", "pre-matching"]:
-                    # 移除规则选项中的这些标记
-                    line = re.sub(rf',\s*{surge_feature}', '', line)
-                    line = re.sub(rf'{surge_feature}\s*,', '', line)
-                    line = re.sub(rf'{surge_feature}', '', line)
-                elif surge_feature in ["REJECT-DROP", "REJECT-TINYGIF", "REJECT-NO-DROP"]:
-                    # 替换拒绝类型
-                    line = line.replace(surge_feature, sr_replacement)
-                elif surge_feature in ["%APPEND%", "%INSERT%"]:
-                    # 移除追加/插入标记
-                    line = line.replace(surge_feature, sr_replacement)
-                
-                if line != original_line:
-                    modified = True
+        # 应用转换规则（先做字面量判断，大部分行不含Surge专属标记）
+        if 'matching' in line:
+            # 移除规则选项中的extended-matching/pre-matching标记
+            for surge_feature in ("extended-matching", "pre-matching"):
+                if surge_feature in line:
+                    for feature_re in FEATURE_RES[surge_feature]:
+                        line = feature_re.sub('', line)
+        if 'REJECT-' in line or '%' in line:
+            # 替换拒绝类型，移除追加/插入标记
+            line = MARKER_RE.sub(_replace_marker, line)
+        modified = line != original_line
         
         # 清理多余的逗号和空格
-        line = re.sub(r',\s*,', ',', line)
-        line = re.sub(r',\s*$', '', line)
-        line = re.sub(r'^\s*,', '', line)
+        if ',' in line:
+            line = COMMA_COLLAPSE_RE.sub(',', line)
+            line = TRAILING_COMMA_RE.sub('', line)
+            line = LEADING_COMMA_RE.sub('', line)
         
-        # 🔥 Surge参数占位符转换：{{{Proxy}}} → PROXY
-        # Shadowrocket不支持 {{{...}}} 语法
-        for placeholder, replacement in PARAMETER_PLACEHOLDER_RULES.items():
-            if placeholder in line:
+        if '{{{' in line:
+            # 🔥 Surge参数占位符转换：{{{Proxy}}} → PROXY
+            # Shadowrocket不支持 {{{...}}} 语法
+            for placeholder, replacement in PARAMETER_PLACEHOLDER_RULES.items():
+                if placeholder in line:
+                    old_line = line
+                    line = line.replace(placeholder, replacement)
+                    if line != old_line:
+                        changes.append(f"参数转换: {placeholder} → {replacement}")
+                        modified = True
+            
+            # 通用占位符处理：任何未知的 {{{xxx}}} → PROXY
+            unknown_placeholders = PLACEHOLDER_RE.findall(line)
+            for placeholder in unknown_placeholders:
                 old_line = line
-                line = line.replace(placeholder, replacement)
+                line = line.replace('{{{' + placeholder + '}}}', 'PROXY')
                 if line != old_line:
-                    changes.append(f"参数转换: {placeholder} → {replacement}")
+                    changes.append(f"未知参数转换: {{{{{{{placeholder}}}}}}} → PROXY")
                     modified = True
         
-        # 通用占位符处理：任何未知的 {{{xxx}}} → PROXY
-        unknown_placeholders = re.findall(r'\{\{\{([^}]+)\}\}\}', line)
-        for placeholder in unknown_placeholders:
-            old_line = line
-            line = re.sub(r'\{\{\{' + re.escape(placeholder) + r'\}\}\}', 'PROXY', line)
-            if line != old_line:
-                changes.append(f"未知参数转换: {{{{{{{placeholder}}}}}}} → PROXY")
-                modified = True
-        
         # 🔥 DNS转换：h3:// 和 https:// DoH → 普通DNS IP
         # Shadowrocket不支持 server:h3:// 和 server:https:// 语法
         # 但跳过某些无法转换的DoH（如Apple DoH没有公开IPv4）
-        should_skip_dns = False
-        for skip_pattern in SKIP_DNS_CONVERSION_PATTERNS:
-            if re.search(skip_pattern, line):
-                should_skip_dns = True
-                break
-        
-        if not should_skip_dns:
-            for pattern, replacement in DNS_CONVERSION_PATTERNS:
-                if re.search(pattern, line):
-                    old_line = line
-                    line = re.sub(pattern, replacement, line)
-                    if line != old_line:
-                        changes.append(f"DNS转换: {old_line.strip()[:50]} → {line.strip()[:50]}")
-                        modified = True
+        if 'server:' in line:
+            should_skip_dns = False
+            for skip_pattern in SKIP_DNS_RES:
+                if skip_pattern.search(line):
+                    should_skip_dns = True
+                    break
+            
+            if not should_skip_dns:
+                for pattern, replacement in DNS_CONVERSION_RES:
+                    if pattern.search(line):
+                        old_line = line
+                        line = pattern.sub(replacement, line)
+                        if line != old_line:
+                            changes.append(f"DNS转换: {old_line.strip()[:50]} → {line.strip()[:50]}")
+                            modified = True
         
         if modified and line != original_line:
             changes.append(f"转换: {original_line.strip()[:40]} → {line.strip()[:40]}")
         
-        new_lines.append(line)
-    
-    # 修改模块描述，标记为Shadowrocket版本
-    result = '\n'.join(new_lines)
-    
-    # 在#!desc后添加[SR]标记
-    result = re.sub(
-        r'(#!desc\s*[=:]\s*)(.+)',
-        r'\1[🚀SR] \2',
-        result
-    )
-    
-    return result, changes
+        # 修改模块描述，在#!desc后添加[SR]标记，标记为Shadowrocket版本
+        if line.startswith('#!desc'):
+            line = tag_desc_line(line)
+        
+        if first:
+            first = False
+            yield line
+        else:
+            yield '\n' + line
+
+
+def convert_module_file(src_path, dst_path):
+    """
+    转换单个模块文件（在工作进程中执行），边读边转换边写入Shadowrocket目录
+    返回: (转换记录列表, 错误信息或None)
+    """
+    changes = []
+    try:
+        with open(src_path, 'r', encoding='utf-8') as src, \
+                open(dst_path, 'w', encoding='utf-8') as dest:
+            dest.writelines(convert_lines(src, changes))
+    except Exception as e:
+        # 不留下写了一半的文件
+        Path(dst_path).unlink(missing_ok=True)
+        return changes, str(e)
+    return changes, None
 
 
 def process_all_modules():
@@ -226,30 +307,30 @@ def process_all_modules():
     print("=" * 60)
     print()
     
-    for cat in categories:
-        cat_path = SURGE_MODULE_DIR / cat
-        if not cat_path.exists():
-            continue
-        
-        stats["categories"][cat] = {"total": 0, "converted": 0}
-        
-        print(f"📁 处理分类: {cat}")
-        
-        for module_file in sorted(cat_path.glob("*.sgmodule")):
-            stats["total"] += 1
-            stats["categories"][cat]["total"] += 1
+    # 所有分类共用一个进程池，避免每个分类重复启动/关闭进程
+    with ProcessPoolExecutor() as executor:
+        for cat in categories:
+            cat_path = SURGE_MODULE_DIR / cat
+            if not cat_path.exists():
+                continue
             
-            try:
-                with open(module_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 转换内容
-                converted_content, changes = convert_module_content(content, module_file.name)
+            stats["categories"][cat] = {"total": 0, "converted": 0}
+            
+            print(f"📁 处理分类: {cat}")
+            
+            # 每个模块独立转换，分发到进程池并行处理；map保持原有顺序输出
+            module_files = sorted(cat_path.glob("*.sgmodule"))
+            sr_files = [SR_MODULE_DIR / cat / module_file.name for module_file in module_files]
+            
+            results = executor.map(convert_module_file, module_files, sr_files, chunksize=8)
+            for module_file, (changes, error) in zip(module_files, results):
+                stats["total"] += 1
+                stats["categories"][cat]["total"] += 1
                 
-                # 保存到Shadowrocket目录
-                sr_file = SR_MODULE_DIR / cat / module_file.name
-                with open(sr_file, 'w', encoding='utf-8') as f:
-                    f.write(converted_content)
+                if error is not None:
+                    stats["skipped"] += 1
+                    print(f"  ❌ {module_file.name}: {error}")
+                    continue
                 
                 stats["converted"] += 1
                 stats["categories"][cat]["converted"] += 1
@@ -263,21 +344,16 @@ def process_all_modules():
                     print(f"  ✅ {module_file.name} ({len(changes)} 处转换)")
                 else:
                     print(f"  ✅ {module_file.name} (无需转换)")
-                    
-            except Exception as e:
-                stats["skipped"] += 1
-                print(f"  ❌ {module_file.name}: {e}")
-        
-        print()
+            
+            print()
     
     # 保存转换日志
     log_file = OUTPUT_DIR / "shadowrocket_conversion_log.json"
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            "generated": datetime.now().isoformat(),
-            "stats": stats,
-            "conversions": conversion_log
-        }, f, ensure_ascii=False, indent=2)
+    write_json(log_file, {
+        "generated": datetime.now().isoformat(),
+        "stats": stats,
+        "conversions": conversion_log
+    })
     
     print("=" * 60)
     print(f"✅ 转换完成!")
@@ -324,22 +400,20 @@ def generate_sr_module_data():
             # 解析模块信息
             info = {"name": module_file.stem, "desc": ""}
             try:
+                # 只读取前20行的头部
                 with open(module_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                for line in content.split('\n')[:20]:
-                    if line.startswith('#!name'):
-                        match = re.search(r'#!name\s*[=:]\s*(.+)', line)
-                        if match:
-                            info["name"] = match.group(1).strip()
-                    elif line.startswith('#!desc'):
-                        match = re.search(r'#!desc\s*[=:]\s*(.+)', line)
-                        if match:
-                            info["desc"] = match.group(1).strip()[:60]
+                    head = ''.join(islice(f, 20))
+                # 重复的 #!name / #!desc 以最后一行为准
+                names = NAME_LINE_RE.findall(head)
+                if names:
+                    info["name"] = names[-1].strip()
+                descs = DESC_LINE_RE.findall(head)
+                if descs:
+                    info["desc"] = descs[-1].strip()[:60]
             except:
                 pass
             
             # 生成URL
-            from urllib.parse import quote
             encoded_filename = quote(module_file.name, safe='')
             url = f"{GITHUB_RAW_BASE_SR}/{cat_key}/{encoded_filename}"
             
@@ -361,22 +435,29 @@ def update_helper_html_with_sr(sr_modules: dict):
         return
     
     # 生成SR模块的JS数据
-    sr_js_data = json.dumps(sr_modules, ensure_ascii=False, separators=(',', ':'))
+    if orjson is not None:
+        sr_js_data = orjson.dumps(sr_modules).decode('utf-8')
+    else:
+        sr_js_data = json.dumps(sr_modules, ensure_ascii=False, separators=(',', ':'))
     
     with open(helper_path, 'r', encoding='utf-8') as f:
         content = f.read()
+    original_content = content
     
     # 检查是否已有srModules变量
     if 'const srModules = ' in content:
         # 替换现有数据
-        pattern = r'const srModules = \{[^;]*\};'
         replacement = f'const srModules = {sr_js_data};'
-        content = re.sub(pattern, replacement, content, flags=re.DOTALL)
+        content = SR_MODULES_VAR_RE.sub(replacement, content)
     else:
         # 在modules变量后添加srModules
-        pattern = r'(const modules = \{[^;]*\};)'
         replacement = f'\\1\nconst srModules = {sr_js_data};'
-        content = re.sub(pattern, replacement, content, flags=re.DOTALL)
+        content = MODULES_VAR_RE.sub(replacement, content)
+    
+    # 数据没有变化时不重写文件
+    if content == original_content:
+        print(f"  ℹ️  surge_module_helper.html 无变化")
+        return
     
     with open(helper_path, 'w', encoding='utf-8') as f:
         f.write(content)
@@ -399,12 +480,11 @@ if __name__ == "__main__":
     
     # 4. 保存SR模块数据
     sr_data_file = OUTPUT_DIR / "shadowrocket_modules_data.json"
-    with open(sr_data_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            "generated": datetime.now().isoformat(),
-            "total": sum(len(cat["items"]) for cat in sr_modules.values()),
-            "categories": sr_modules
-        }, f, ensure_ascii=False, indent=2)
+    write_json(sr_data_file, {
+        "generated": datetime.now().isoformat(),
+        "total": sum(len(cat["items"]) for cat in sr_modules.values()),
+        "categories": sr_modules
+    })
     print(f"  ✅ 保存 {sr_data_file}")
     
     print()
@@ -6,9 +6,20 @@
 
 import json
 
+try:
+    import orjson  # 可选: 有则用于读写配置
+except ImportError:
+    orjson = None
+
+CONFIG_PATH = 'substore/Singbox_substore_1.13.0+.json'
+
 def main():
-    with open('substore/Singbox_substore_1.13.0+.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    if orjson is not None:
+        with open(CONFIG_PATH, 'rb') as f:
+            config = orjson.loads(f.read())
+    else:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config = json.load(f)
 
     changes = []
 
@@ -124,8 +135,12 @@ def main():
     # ==================== 保存配置 ====================
     config['dns'] = dns
     
-    with open('substore/Singbox_substore_1.13.0+.json', 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        with open(CONFIG_PATH, 'wb') as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    else:
+        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
 
     print("✅ 安全增强完成！")
     print("\n已应用的更改:")
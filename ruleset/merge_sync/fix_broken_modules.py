@@ -1,19 +1,41 @@
 #!/usr/bin/env python3
 """检查并修复损坏的模块文件"""
 import os
-import glob
+import re
 
 surge_dir = 'module/surge(main)'
 shadowrocket_dir = 'module/shadowrocket'
 
 broken_modules = []
 
-def check_module(filepath):
+MODULE_SUFFIXES = ('.sgmodule', '.module')
+
+# 只读文件开头：500字节以下的文件会被完整读入，大文件只需检查开头是否为HTML错误页面
+HEAD_SIZE = 1024
+
+# 有效模块的元数据和段落标记，各用一个正则一次扫描
+HAS_METADATA_RE = re.compile(r'#!(?:name|desc)=')
+HAS_SECTION_RE = re.compile(r'\[(?:Rule|Script|MITM|URL Rewrite|Header Rewrite|General|Map Local|Host)\]')
+
+def iter_module_entries(base_dir, depth=1):
+    """用 os.scandir 遍历 base_dir 及其下 depth 层子目录中的模块文件（跳过隐藏文件，与 glob 的 * 一致）"""
+    try:
+        entries = list(os.scandir(base_dir))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir():
+            if depth > 0:
+                yield from iter_module_entries(entry.path, depth - 1)
+        elif entry.name.endswith(MODULE_SUFFIXES) and entry.is_file():
+            yield entry
+
+def check_module(filepath, filesize):
     """检查模块是否损坏"""
-    filesize = os.path.getsize(filepath)
-    
     with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
+        content = f.read(HEAD_SIZE)
     
     issues = []
     
@@ -23,7 +45,7 @@ def check_module(filepath):
     
     # 2. 内容只有 "Not Found" 或类似错误
     content_lower = content.lower().strip()
-    if content_lower in ['not found', '404', '404 not found']:
+    if filesize <= HEAD_SIZE and content_lower in ['not found', '404', '404 not found']:
         issues.append('内容为404错误')
     elif 'not found' in content_lower and filesize < 500:
         issues.append('可能是404错误页面')
@@ -32,12 +54,10 @@ def check_module(filepath):
     if '<!doctype html>' in content_lower or '<html' in content_lower:
         issues.append('HTML错误页面')
     
-    # 4. 没有任何有效的模块元数据或内容
-    has_metadata = '#!name=' in content or '#!desc=' in content
-    has_content = any(s in content for s in ['[Rule]', '[Script]', '[MITM]', '[URL Rewrite]', '[Header Rewrite]', '[General]', '[Map Local]', '[Host]'])
-    
-    if not has_metadata and not has_content and filesize < 500:
-        issues.append('缺少有效模块内容')
+    # 4. 没有任何有效的模块元数据或内容（只对小文件有意义）
+    if filesize < 500:
+        if not HAS_METADATA_RE.search(content) and not HAS_SECTION_RE.search(content):
+            issues.append('缺少有效模块内容')
     
     return issues, filesize
 
@@ -47,15 +67,15 @@ def scan_all_modules():
     
     total = 0
     for base_dir in [surge_dir, shadowrocket_dir]:
-        for pattern in ['*/*.sgmodule', '*/*.module', '*.sgmodule', '*.module']:
-            for filepath in glob.glob(os.path.join(base_dir, pattern)):
-                total += 1
-                issues, filesize = check_module(filepath)
-                if issues:
-                    broken_modules.append((filepath, issues, filesize))
-                    print(f'❌ {os.path.relpath(filepath)} ({filesize}字节)')
-                    for issue in issues:
-                        print(f'   - {issue}')
+        for entry in iter_module_entries(base_dir):
+            filepath = entry.path
+            total += 1
+            issues, filesize = check_module(filepath, entry.stat().st_size)
+            if issues:
+                broken_modules.append((filepath, issues, filesize))
+                print(f'❌ {os.path.relpath(filepath)} ({filesize}字节)')
+                for issue in issues:
+                    print(f'   - {issue}')
     
     print(f'\n=== 扫描结果 ===')
     print(f'总模块数: {total}')
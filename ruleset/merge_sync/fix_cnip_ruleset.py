@@ -3,12 +3,23 @@
 import json
 import sys
 
+try:
+    import orjson  # Optional: faster load/dump of the ruleset JSON
+except ImportError:
+    orjson = None
+
 def fix_cnip_ruleset(filepath):
     """Add ChinaIP ruleset definition and fix cnip references"""
     print(f"Fixing: {filepath}")
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    if orjson is not None:
+        with open(filepath, 'rb') as f:
+            config = orjson.loads(f.read())
+    else:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    
+    changed = False
     
     # Add ChinaIP ruleset definition if not exists
     if 'route' in config and 'rule_set' in config['route']:
@@ -25,6 +36,7 @@ def fix_cnip_ruleset(filepath):
                 "update_interval": "24h"
             }
             config['route']['rule_set'].append(chinaip_ruleset)
+            changed = True
             print(f"  ✅ Added ChinaIP ruleset definition")
         else:
             print(f"  ℹ️  ChinaIP ruleset already exists")
@@ -34,6 +46,7 @@ def fix_cnip_ruleset(filepath):
         for inbound in config['inbounds']:
             if 'route_exclude_address_set' in inbound and inbound['route_exclude_address_set'] == 'cnip':
                 inbound['route_exclude_address_set'] = 'surge-chinaip'
+                changed = True
                 print(f"  ✅ Fixed route_exclude_address_set: cnip → surge-chinaip")
     
     # Fix rules reference
@@ -41,11 +54,20 @@ def fix_cnip_ruleset(filepath):
         for rule in config['route']['rules']:
             if 'rule_set' in rule and rule['rule_set'] == 'cnip':
                 rule['rule_set'] = 'surge-chinaip'
+                changed = True
                 print(f"  ✅ Fixed rule reference: cnip → surge-chinaip")
     
+    if not changed:
+        print(f"  ℹ️  Nothing to fix\n")
+        return
+    
     # Write back
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
     
     print(f"  ✅ Config fixed\n")
 
@@ -8,63 +8,62 @@ Example:
   IP-CIDR,xxx,no-resolve,REJECT -> IP-CIDR,xxx,no-resolve
 """
 
+import os
 import sys
 import re
+import shutil
 from pathlib import Path
 
-def fix_ruleset(filepath):
-    """Fix a single ruleset file."""
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
+def clean_rule_line(original_line):
+    """Clean one raw line. Returns (cleaned line without newline, whether a rule was fixed)."""
+    line = original_line.strip()
     
-    cleaned_lines = []
-    fixed_count = 0
+    # Keep comments and empty lines
+    if not line or line.startswith('#'):
+        return original_line.rstrip(), False
     
-    # Policies that should be removed
-    policies = {'REJECT', 'DIRECT', 'PROXY', 'REJECT-DROP', 'REJECT-TINYGIF', 
-                'REJECT-NO-DROP', 'REJECT-IMG'}
+    parts = line.split(',')
+    if len(parts) < 2:
+        return line, False
     
-    # Options that should be removed (except no-resolve for IP rules)
-    options = {'extended-matching', 'pre-matching'}
+    new_parts = [parts[0], parts[1]]  # Keep rule type and value
     
-    for line in lines:
-        original_line = line
-        line = line.strip()
-        
-        # Keep comments and empty lines
-        if not line or line.startswith('#'):
-            cleaned_lines.append(original_line.rstrip())
-            continue
-        
-        parts = line.split(',')
-        if len(parts) < 2:
-            cleaned_lines.append(line)
-            continue
-        
-        rule_type = parts[0]
-        
-        # Filter out parts that are policies or options
-        new_parts = [parts[0], parts[1]]  # Keep rule type and value
-        
-        # For IP rules, keep no-resolve if present
-        for i in range(2, len(parts)):
-            part = parts[i].strip()
-            if part.lower() == 'no-resolve':
-                new_parts.append('no-resolve')
-            elif part.upper() not in policies and part.lower() not in options:
-                # Unknown part, might be part of the value
-                pass
-        
-        new_line = ','.join(new_parts)
-        
-        if new_line != line:
-            fixed_count += 1
-        
-        cleaned_lines.append(new_line)
+    # For IP rules, keep no-resolve if present. Everything else after
+    # the value (policies like REJECT/DIRECT, options like
+    # extended-matching, unknown parts) is dropped.
+    for part in parts[2:]:
+        if part.strip().lower() == 'no-resolve':
+            new_parts.append('no-resolve')
+    
+    new_line = ','.join(new_parts)
+    return new_line, new_line != line
+
+def fix_ruleset(filepath):
+    """Fix a single ruleset file (streamed to a temp file, then swapped in)."""
+    # Read-only pass first: leave files that are already clean untouched.
+    # newline='' keeps CRLF visible so those files still get normalized.
+    with open(filepath, 'r', newline='') as src:
+        if all(clean_rule_line(raw)[0] + '\n' == raw for raw in src):
+            return 0
+    
+    tmp_path = f'{filepath}.tmp'
+    fixed_count = 0
     
-    # Write back
-    with open(filepath, 'w') as f:
-        f.write('\n'.join(cleaned_lines) + '\n')
+    try:
+        with open(filepath, 'r') as src, open(tmp_path, 'w') as dst:
+            for original_line in src:
+                new_line, fixed = clean_rule_line(original_line)
+                if fixed:
+                    fixed_count += 1
+                dst.write(new_line + '\n')
+        
+        # Write back
+        shutil.copymode(filepath, tmp_path)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
     
     return fixed_count
 
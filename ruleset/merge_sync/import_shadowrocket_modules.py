@@ -7,6 +7,8 @@
 import os
 import re
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 from urllib.parse import unquote
 
@@ -21,32 +23,77 @@ CATEGORY_MAP = {
     "narrow_pierce": "『 🎯 Narrow Pierce › 窄域穿刺 』",
 }
 
+# 读取模块文件的线程数（iCloud Drive上以打开/读取等待为主）
+SCAN_WORKERS = 8
+
+# 超过此大小的小火箭模块跳过
+SR_MAX_SIZE = 100000
+
+MODULE_NAME_RE = re.compile(r'^#!name\s*[=:]\s*(.+)$', re.MULTILINE)
+UNSAFE_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# 分类关键词（按名称小写匹配，一次扫描）
+AMPLIFY_KEYWORDS_RE = re.compile(r'wifi|calling|helper|enhanced|dns|iringo|dualsubs|tiktok|助手')
+HEAD_KEYWORDS_RE = re.compile(r'ad-?block|firewall|script hub|广告平台|广告联盟|universal')
+
+# 计算哈希时忽略的行（#!category 和 #!url 开头的整行，连同换行符）
+HASH_IGNORE_RE = re.compile(r'^#!(?:category|url)[^\n]*\n?', re.MULTILINE)
+
+def read_module_text(path):
+    """一次性读取整个文件再解码（与 read_text 相同：严格UTF-8，\r\n 和 \r 统一为 \n）"""
+    text = path.read_bytes().decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
 def get_module_name(content):
     """从模块内容提取 #!name"""
-    match = re.search(r'^#!name\s*[=:]\s*(.+)$', content, re.MULTILINE)
+    match = MODULE_NAME_RE.search(content)
     return match.group(1).strip() if match else None
 
 def get_content_hash(content):
     """计算内容哈希（忽略 #!category 和 #!url）"""
-    lines = content.split('\n')
-    filtered = [l for l in lines if not l.startswith('#!category') and not l.startswith('#!url')]
-    return hashlib.md5('\n'.join(filtered).encode()).hexdigest()[:8]
+    filtered = HASH_IGNORE_RE.sub('', content)
+    return hashlib.blake2b(filtered.encode(), digest_size=4).hexdigest()
 
 def classify_module(name, content):
     """根据模块名称和内容自动分类"""
     name_lower = name.lower()
     
     # 功能增强类
-    if any(k in name_lower for k in ['wifi', 'calling', 'helper', 'enhanced', 'dns', 'iringo', 'dualsubs', 'tiktok', '助手']):
+    if AMPLIFY_KEYWORDS_RE.search(name_lower):
         return "amplify_nexus"
     
     # 广告拦截平台类
-    if any(k in name_lower for k in ['ad-block', 'adblock', 'firewall', 'script hub', '广告平台', '广告联盟', 'universal']):
+    if HEAD_KEYWORDS_RE.search(name_lower):
         return "head_expanse"
     
     # App专项去广告（默认）
     return "narrow_pierce"
 
+def scan_existing_module(f):
+    """读取现有Surge模块（在线程池中执行），返回 (name_lower, 信息)，读取失败返回 None"""
+    try:
+        content = read_module_text(f)
+        name = get_module_name(content) or f.stem
+        return name.lower(), {
+            "path": f,
+            "hash": get_content_hash(content),
+            "name": name
+        }
+    except:
+        return None
+
+def load_sr_module(sr_file):
+    """读取小火箭模块（在线程池中执行），返回 (大小, 内容)；超大文件不读取，读取失败时内容为 None"""
+    size = sr_file.stat().st_size
+    if size > SR_MAX_SIZE:
+        return size, None
+    try:
+        return size, read_module_text(sr_file)
+    except:
+        return size, None
+
 def main():
     print("=" * 60)
     print("📦 小火箭模块导入工具（增量更新 + 去重）")
@@ -58,45 +105,39 @@ def main():
     
     # 收集现有模块信息
     existing = {}  # name_lower -> {path, hash, name}
-    for cat in ["amplify_nexus", "head_expanse", "narrow_pierce"]:
-        cat_path = SURGE_DIR / cat
-        if not cat_path.exists():
-            continue
-        for f in cat_path.glob("*.sgmodule"):
-            try:
-                content = f.read_text(encoding='utf-8')
-                name = get_module_name(content) or f.stem
-                existing[name.lower()] = {
-                    "path": f,
-                    "hash": get_content_hash(content),
-                    "name": name
-                }
-            except:
-                pass
+    all_files = list(chain.from_iterable(
+        (SURGE_DIR / cat).glob("*.sgmodule")
+        for cat in ["amplify_nexus", "head_expanse", "narrow_pierce"]
+    ))
     
-    print(f"现有模块数: {len(existing)}\n")
+    # 跳过以 __ 开头的（我们同步过去的）
+    sr_files = [f for f in sorted(SR_DIR.glob("*.*module")) if not f.name.startswith("__")]
+    
+    # 并行读取两侧的模块文件；map保持顺序，合并和处理仍在主线程按原顺序进行
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        for result in executor.map(scan_existing_module, all_files):
+            if result is not None:
+                name_key, info = result
+                existing[name_key] = info
+        
+        print(f"现有模块数: {len(existing)}\n")
+        
+        sr_results = executor.map(load_sr_module, sr_files)
     
     # 统计
     added = updated = duplicate = skipped = 0
     
     # 处理小火箭模块
-    for sr_file in sorted(SR_DIR.glob("*.*module")):
+    for sr_file, (size, content) in zip(sr_files, sr_results):
         filename = sr_file.name
         
-        # 跳过以 __ 开头的（我们同步过去的）
-        if filename.startswith("__"):
-            continue
-        
         # 跳过超大文件
-        size = sr_file.stat().st_size
-        if size > 100000:
+        if size > SR_MAX_SIZE:
             print(f"⏭️  跳过大文件: {filename} ({size//1024}KB)")
             skipped += 1
             continue
         
-        try:
-            content = sr_file.read_text(encoding='utf-8')
-        except:
+        if content is None:
             print(f"❌ 读取失败: {filename}")
             continue
         
@@ -121,7 +162,7 @@ def main():
         category = classify_module(module_name, content)
         
         # 清理文件名
-        safe_name = re.sub(r'[<>:"/\\|?*]', '', module_name)
+        safe_name = UNSAFE_FILENAME_RE.sub('', module_name)
         if not safe_name.endswith('.sgmodule'):
             safe_name += '.sgmodule'
         
@@ -149,7 +190,7 @@ def main():
             new_lines.insert(0, f"#!category={CATEGORY_MAP[category]}")
         
         # 写入
-        dst_path.write_text('\n'.join(new_lines), encoding='utf-8')
+        dst_path.write_bytes('\n'.join(new_lines).encode('utf-8'))
         print(f"✅ 新增: {module_name} → {category}/")
         added += 1
     
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """重新下载损坏的模块"""
 import os
+import re
 import urllib.request
 import ssl
 
@@ -9,6 +10,17 @@ MODULES_TO_FIX = {
     'iRingo.Location.sgmodule': 'https://github.com/NSRingo/GeoServices/releases/latest/download/iRingo.Location.sgmodule',
 }
 
+# SSL上下文和opener在导入时创建一次，所有下载共用（与原先一样不校验证书）
+SSL_CONTEXT = ssl.create_default_context()
+SSL_CONTEXT.check_hostname = False
+SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+URL_OPENER = urllib.request.build_opener(urllib.request.HTTPSHandler(context=SSL_CONTEXT))
+URL_OPENER.addheaders = [('User-Agent', 'Mozilla/5.0')]
+
+# 按文件名关键词分类（各用一个正则一次扫描）
+AMPLIFY_FILENAME_RE = re.compile(r'iRingo|DNS|BiliBili')
+HEAD_FILENAME_RE = re.compile(r'Ad|Block')
+
 # 分类
 CATEGORIES = {
     'amplify_nexus': '『 🛠️ Amplify Nexus › 增幅枢纽 』',
@@ -20,14 +32,8 @@ def download_module(url, filepath, category):
     """下载模块并添加category"""
     print(f'下载: {url}')
     
-    # 创建SSL上下文
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
-    
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, context=ctx, timeout=30) as response:
+        with URL_OPENER.open(url, timeout=30) as response:
             content = response.read().decode('utf-8')
         
         # 检查是否有效
@@ -70,9 +76,9 @@ def main():
     
     for filename, url in MODULES_TO_FIX.items():
         # 确定目录和分类
-        if 'iRingo' in filename or 'DNS' in filename or 'BiliBili' in filename:
+        if AMPLIFY_FILENAME_RE.search(filename):
             subdir = 'amplify_nexus'
-        elif 'Ad' in filename or 'Block' in filename:
+        elif HEAD_FILENAME_RE.search(filename):
             subdir = 'head_expanse'
         else:
             subdir = 'amplify_nexus'
@@ -1,9 +1,18 @@
 import os
+import re
 import glob
+import mmap
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
 RULESET_DIR = os.path.join(os.path.dirname(__file__), "../ruleset/Surge(Shadowkroket)")
 
+# Threads used to load and write the .list files (per-file I/O is independent)
+IO_WORKERS = 8
+
+# Files at least this large are decoded straight from an mmap (no extra bytes copy)
+MMAP_MIN_SIZE = 64 * 1024
+
 # Priority Definitions (Higher priority lists steal domains from Lower priority lists)
 # Format: "Specific": ["Generic1", "Generic2"]
 # Meaning: If a domain is in Specific, remove it from Generic1 and Generic2.
@@ -64,6 +73,16 @@ CONFLICT_MAP = {
 # Also standard exclusions: Remove "Direct" domains from "Proxy" lists if they appear?
 # Maybe too risky. Focus on the defined map.
 
+# One rule per line: skips blank, "#" and "//" lines, drops trailing "# comment"
+# and surrounding whitespace. [^\S\n] is whitespace that stays within the line.
+RULE_LINE_RE = re.compile(r'^[^\S\n]*(?!//)([^#\s](?:[^#\n]*[^#\s])?)[^\S\n]*(?:#[^\n]*)?$', re.MULTILINE)
+
+# Leading header block: comment lines ("#...") and blank lines before the first rule
+HEADER_RE = re.compile(r'(?:#[^\n]*\n?|[^\S\n]*\n|[^\S\n]+\Z)*')
+
+# Marker line(s) left at the end of the header by earlier runs (replaced, not stacked)
+CLEANUP_MARKER_RE = re.compile(r'(?:# \[smart_cleanup\.py\] Deduplicated: \d+ rules\n\s*)+\Z')
+
 def is_valid_rule(line):
     """Check if rule is valid (Surge/Shadowrocket compatible)"""
     # Skip RULE-SET (should not appear in .list files)
@@ -85,73 +104,84 @@ def clean_rule(line):
     return line
 
 def load_list(filepath):
-    """Loads rules from a file into a set."""
+    """Loads rules from a file into a set. Returns (rules, header text)."""
     rules = set()
     if not os.path.exists(filepath):
-        return rules
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('//'):
-                 # Normalize: remove comments "DOMAIN,x.com # comment"
-                if '#' in line:
-                    line = line.split('#')[0].strip()
-                # Clean invalid rules
-                line = clean_rule(line)
-                # Skip invalid rules
-                if is_valid_rule(line):
-                    rules.add(line)
-    return rules
-
-def write_list(filepath, rules):
-    """Writes sorted rules back to file, preserving existing header if present."""
-    sorted_rules = sorted(list(rules))
+        return rules, ''
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = str(mm, 'utf-8', 'ignore')
+        else:
+            text = f.read().decode('utf-8', errors='ignore')
+    # Same line boundaries as text-mode iteration
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    rules = set(RULE_LINE_RE.findall(text))
+    # clean_rule/is_valid_rule only act on RULE-SET lines and ",no-resolve";
+    # most files contain neither, so skip the per-rule pass for them
+    if 'RULE-SET' in text or ',no-resolve' in text:
+        # Clean invalid rules, then skip invalid rules
+        rules = {line for line in map(clean_rule, rules) if is_valid_rule(line)}
+    # Keep all comment lines as header, up to the first rule line
+    header = HEADER_RE.match(text).group()
+    return rules, header
+
+def write_list(filepath, rules, header):
+    """Writes sorted rules back to file, preserving the header load_list() found if present.
+
+    Returns False when the file already has exactly this content and was left untouched.
+    """
+    sorted_rules = sorted(rules)
     filename = os.path.basename(filepath)
     
     # Try to preserve existing header (detailed header generated by ruleset_merger.sh)
-    existing_header = []
-    
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                # Keep all comment lines as header
-                if line.startswith('#') or (line.strip() == ''):
-                    existing_header.append(line)
-                else:
-                    # First rule line, header ends
-                    break
-    
-    # Write file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        if existing_header and len(existing_header) > 5:
-            # Has detailed header, keep it (including all comments and category markers)
-            for line in existing_header:
-                f.write(line)
-            # Add smart_cleanup marker at end of header
-            f.write(f"# [smart_cleanup.py] Deduplicated: {len(sorted_rules)} rules\n")
-            f.write("\n")
-        else:
-            # No detailed header, use simple header
-            f.write(f"# Ruleset: {filename}\n")
-            f.write("# Cleaned by smart_cleanup.py\n")
-            f.write(f"# Total: {len(sorted_rules)}\n")
-            f.write("\n")
-        
-        # Write rules (no longer adding category markers, already in header)
-        for rule in sorted_rules:
-            f.write(rule + "\n")
+    header_lines = header.count('\n') + (not header.endswith('\n') and header != '')
+    
+    parts = []
+    if header_lines > 5:
+        # Has detailed header, keep it (including all comments and category markers)
+        parts.append(CLEANUP_MARKER_RE.sub('', header))
+        # Add smart_cleanup marker at end of header
+        parts.append(f"# [smart_cleanup.py] Deduplicated: {len(sorted_rules)} rules\n")
+        parts.append("\n")
+    else:
+        # No detailed header, use simple header
+        parts.append(f"# Ruleset: {filename}\n")
+        parts.append("# Cleaned by smart_cleanup.py\n")
+        parts.append(f"# Total: {len(sorted_rules)}\n")
+        parts.append("\n")
+    
+    # Write rules (no longer adding category markers, already in header)
+    parts.extend(rule + "\n" for rule in sorted_rules)
+    data = ''.join(parts).encode('utf-8')
+    
+    # Skip unchanged files (keeps mtime, avoids needless rewrites)
+    try:
+        if os.path.getsize(filepath) == len(data):
+            with open(filepath, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return True
 
 def main():
     print("Starting Smart Cleanup...")
     
     # 1. Load all content into memory map
     file_content = {} # filename -> set of rules
+    file_headers = {} # filename -> existing header text
     
     # Get all .list files
     files = glob.glob(os.path.join(RULESET_DIR, "*.list"))
-    for fpath in files:
-        fname = os.path.basename(fpath)
-        file_content[fname] = load_list(fpath)
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+        for fpath, (rules, header) in zip(files, executor.map(load_list, files)):
+            fname = os.path.basename(fpath)
+            file_content[fname], file_headers[fname] = rules, header
         
     # 2. Apply Conflict Map (Subtraction)
     for specific_name, generic_names in CONFLICT_MAP.items():
@@ -180,10 +210,15 @@ def main():
     # We already did that.
     
     # 4. Save changed files
-    for fname, rules in file_content.items():
-        fpath = os.path.join(RULESET_DIR, fname)
-        write_list(fpath, rules)
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+        written = sum(executor.map(
+            write_list,
+            [os.path.join(RULESET_DIR, fname) for fname in file_content],
+            file_content.values(),
+            [file_headers[fname] for fname in file_content],
+        ))
         
+    print(f"Rewrote {written} of {len(file_content)} files")
     print("Smart Cleanup Complete.")
 
 if __name__ == "__main__":
@@ -7,10 +7,64 @@
 import json
 import sys
 
+try:
+    import orjson  # 可选: 读写Singbox配置更快
+except ImportError:
+    orjson = None
+
+CONFIG_PATH = 'substore/Singbox_substore_1.13.0+.json'
+
+FALLBACK_TAG = '🔗 自动回退 🏁'
+
+# 策略组更新表：tag -> 要写入的字段（YouTube 的两种写法都统一为无前导空格的 tag）
+YOUTUBE_PATCH = {
+    'tag': '▶️  YouTube 🔴',
+    'outbounds': ['🇺🇸 西方 🇫🇷', '🇯🇵 JP 🇯🇵', '🇸🇬 亚洲 🇰🇷', '🇬🇧 UK 🇬🇧', '🇭🇰 港澳台 🇲🇴', '🇺🇸 美国 🇺🇸', '🇭🇰 香港 🇭🇰', '🇹🇼 台湾 🇹🇼', '🇸🇬 新加坡 🇸🇬', '🇰🇷 韩国 🇰🇷', '🇲🇴 澳门 🇲🇴', '🗺️ 直连通用 🌏'],
+    'default': '🇺🇸 西方 🇫🇷',
+}
+OUTBOUND_PATCHES = {
+    '🐟 漏网之鱼 🕸️': {
+        'outbounds': ['♻️ 自动入口 🧠', '🚫 漏网绝杀 🕸️', '🗺️ 直连通用 🌏', '🌍 海外通用 🌍', FALLBACK_TAG],
+    },
+    ' ▶️  YouTube 🔴': YOUTUBE_PATCH,
+    '▶️  YouTube 🔴': YOUTUBE_PATCH,
+    '📱 TikTok 🧠': {
+        'outbounds': ['🇰🇷 韩国 🇰🇷', '🇯🇵 JP 🇯🇵', '🇺🇸 西方 🇫🇷', '🇸🇬 亚洲 🇰🇷', '🇬🇧 UK 🇬🇧', '🇺🇸 美国 🇺🇸', '🇸🇬 新加坡 🇸🇬', '🇹🇼 台湾 🇹🇼', '🇭🇰 香港 🇭🇰', '🇲🇴 澳门 🇲🇴', '🗺️ 直连通用 🌏'],
+        'default': '🇰🇷 韩国 🇰🇷',
+    },
+    '🔊  Spotify  🟢': {
+        'outbounds': ['🇺🇸 西方 🇫🇷', '🇯🇵 JP 🇯🇵', '🇸🇬 亚洲 🇰🇷', '🇬🇧 UK 🇬🇧', '🇭🇰 港澳台 🇲🇴', '🇺🇸 美国 🇺🇸', '🇭🇰 香港 🇭🇰', '🇹🇼 台湾 🇹🇼', '🇸🇬 新加坡 🇸🇬', '🇰🇷 韩国 🇰🇷', '🇲🇴 澳门 🇲🇴', '🗺️ 直连通用 🌏'],
+        'default': '🇺🇸 西方 🇫🇷',
+    },
+    '🌍 海外通用 🌍': {
+        'outbounds': ['🕳️ 落地节点 🔐 +', '🇭🇰 港澳台 🇲🇴', '🇺🇸 西方 🇫🇷', '🇸🇬 亚洲 🇰🇷', '🗺️ 中国大陆 🇨🇳', '🇯🇵 JP 🇯🇵', '🇬🇧 UK 🇬🇧', '🇺🇸 美国 🇺🇸', '🇭🇰 香港 🇭🇰', '🇲🇴 澳门 🇲🇴', '🇹🇼 台湾 🇹🇼', '🇸🇬 新加坡 🇸🇬', '🇰🇷 韩国 🇰🇷', '🇯🇵日本专线🧱', '🇺🇸美国专线🧱', '🇭🇰香港专线🧱', '🇸🇬新加坡专线🧱', '🇹🇼台湾专线🧱', '🇬🇧英国专线🧱', '🇰🇷韩国专线🧱', '🧱仅专线🧱'],
+        'default': '🕳️ 落地节点 🔐 +',
+    },
+    '🤖AI平台🤖': {
+        'type': 'urltest',
+        'outbounds': ['🇺🇸美国专线🧱', '🇺🇸 美国 🇺🇸'],
+        'url': 'http://www.cloudflare.com/generate_204',
+        'interval': '10m',
+        'tolerance': 50,
+    },
+    '☎️telegram✈️': {
+        'outbounds': ['🇯🇵 JP 🇯🇵', '🇺🇸 美国 🇺🇸'],
+        'default': '🇯🇵 JP 🇯🇵',
+    },
+    '🌐 社交媒体 📱': {
+        'outbounds': ['🇯🇵日本专线🧱', '🇺🇸美国专线🧱', '🇰🇷韩国专线🧱', '🇯🇵 JP 🇯🇵', '🇺🇸 美国 🇺🇸'],
+        'default': '🇯🇵日本专线🧱',
+    },
+}
+
 def main():
     # 读取原始配置文件
-    with open('substore/Singbox_substore_1.13.0+.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    if orjson is not None:
+        with open(CONFIG_PATH, 'rb') as f:
+            config = orjson.loads(f.read())
+    else:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config = json.load(f)
 
     changes_made = []
 
@@ -59,84 +113,54 @@ def main():
     if ruleset_updated > 0:
         changes_made.append(f"rule_set download_detour已更新 ({ruleset_updated}处)")
 
-    # 5. 更新策略组
-    for outbound in config['outbounds']:
+    # 5. 更新策略组（一次遍历，同时记录第6步需要的回退组/插入位置）
+    fallback_exists = False
+    anchor_index = None
+    for i, outbound in enumerate(config['outbounds']):
         tag = outbound.get('tag', '')
         
-        if tag == '🐟 漏网之鱼 🕸️':
-            outbound['outbounds'] = ['♻️ 自动入口 🧠', '🚫 漏网绝杀 🕸️', '🗺️ 直连通用 🌏', '🌍 海外通用 🌍', '🔗 自动回退 🏁']
-            changes_made.append("🐟 漏网之鱼 🕸️ 已更新")
-        
-        elif tag == ' ▶️  YouTube 🔴' or tag == '▶️  YouTube 🔴':
-            outbound['tag'] = '▶️  YouTube 🔴'
-            outbound['outbounds'] = ['🇺🇸 西方 🇫🇷', '🇯🇵 JP 🇯🇵', '🇸🇬 亚洲 🇰🇷', '🇬🇧 UK 🇬🇧', '🇭🇰 港澳台 🇲🇴', '🇺🇸 美国 🇺🇸', '🇭🇰 香港 🇭🇰', '🇹🇼 台湾 🇹🇼', '🇸🇬 新加坡 🇸🇬', '🇰🇷 韩国 🇰🇷', '🇲🇴 澳门 🇲🇴', '🗺️ 直连通用 🌏']
-            outbound['default'] = '🇺🇸 西方 🇫🇷'
-            changes_made.append("▶️  YouTube 🔴 已更新")
-        
-        elif tag == '📱 TikTok 🧠':
-            outbound['outbounds'] = ['🇰🇷 韩国 🇰🇷', '🇯🇵 JP 🇯🇵', '🇺🇸 西方 🇫🇷', '🇸🇬 亚洲 🇰🇷', '🇬🇧 UK 🇬🇧', '🇺🇸 美国 🇺🇸', '🇸🇬 新加坡 🇸🇬', '🇹🇼 台湾 🇹🇼', '🇭🇰 香港 🇭🇰', '🇲🇴 澳门 🇲🇴', '🗺️ 直连通用 🌏']
-            outbound['default'] = '🇰🇷 韩国 🇰🇷'
-            changes_made.append("📱 TikTok 🧠 已更新")
-        
-        elif tag == '🔊  Spotify  🟢':
-            outbound['outbounds'] = ['🇺🇸 西方 🇫🇷', '🇯🇵 JP 🇯🇵', '🇸🇬 亚洲 🇰🇷', '🇬🇧 UK 🇬🇧', '🇭🇰 港澳台 🇲🇴', '🇺🇸 美国 🇺🇸', '🇭🇰 香港 🇭🇰', '🇹🇼 台湾 🇹🇼', '🇸🇬 新加坡 🇸🇬', '🇰🇷 韩国 🇰🇷', '🇲🇴 澳门 🇲🇴', '🗺️ 直连通用 🌏']
-            outbound['default'] = '🇺🇸 西方 🇫🇷'
-            changes_made.append("🔊  Spotify  🟢 已更新")
-        
-        elif tag == '🌍 海外通用 🌍':
-            outbound['outbounds'] = ['🕳️ 落地节点 🔐 +', '🇭🇰 港澳台 🇲🇴', '🇺🇸 西方 🇫🇷', '🇸🇬 亚洲 🇰🇷', '🗺️ 中国大陆 🇨🇳', '🇯🇵 JP 🇯🇵', '🇬🇧 UK 🇬🇧', '🇺🇸 美国 🇺🇸', '🇭🇰 香港 🇭🇰', '🇲🇴 澳门 🇲🇴', '🇹🇼 台湾 🇹🇼', '🇸🇬 新加坡 🇸🇬', '🇰🇷 韩国 🇰🇷', '🇯🇵日本专线🧱', '🇺🇸美国专线🧱', '🇭🇰香港专线🧱', '🇸🇬新加坡专线🧱', '🇹🇼台湾专线🧱', '🇬🇧英国专线🧱', '🇰🇷韩国专线🧱', '🧱仅专线🧱']
-            outbound['default'] = '🕳️ 落地节点 🔐 +'
-            changes_made.append("🌍 海外通用 🌍 已更新")
-        
-        elif tag == '🤖AI平台🤖':
-            outbound['type'] = 'urltest'
-            outbound['outbounds'] = ['🇺🇸美国专线🧱', '🇺🇸 美国 🇺🇸']
-            outbound['url'] = 'http://www.cloudflare.com/generate_204'
-            outbound['interval'] = '10m'
-            outbound['tolerance'] = 50
-            if 'default' in outbound:
-                del outbound['default']
-            changes_made.append("🤖AI平台🤖 已更新")
-        
-        elif tag == '☎️telegram✈️':
-            outbound['outbounds'] = ['🇯🇵 JP 🇯🇵', '🇺🇸 美国 🇺🇸']
-            outbound['default'] = '🇯🇵 JP 🇯🇵'
-            changes_made.append("☎️telegram✈️ 已更新")
-        
-        elif tag == '🌐 社交媒体 📱':
-            outbound['outbounds'] = ['🇯🇵日本专线🧱', '🇺🇸美国专线🧱', '🇰🇷韩国专线🧱', '🇯🇵 JP 🇯🇵', '🇺🇸 美国 🇺🇸']
-            outbound['default'] = '🇯🇵日本专线🧱'
-            changes_made.append("🌐 社交媒体 📱 已更新")
+        patch = OUTBOUND_PATCHES.get(tag)
+        if patch is not None:
+            # 复制列表，避免多个策略组与常量表共用同一个列表
+            outbound.update({k: list(v) if isinstance(v, list) else v for k, v in patch.items()})
+            # 改为 urltest 的策略组没有 default
+            if patch.get('type') == 'urltest':
+                outbound.pop('default', None)
+            changes_made.append(f"{outbound['tag']} 已更新")
+        elif tag == FALLBACK_TAG:
+            fallback_exists = True
+        elif tag == '🧱仅专线🧱' and anchor_index is None:
+            anchor_index = i
 
     # 6. 添加 🔗 自动回退 🏁 策略组
-    fallback_exists = any(o.get('tag') == '🔗 自动回退 🏁' for o in config['outbounds'])
-    if not fallback_exists:
+    if not fallback_exists and anchor_index is not None:
         fallback_group = {
             'type': 'urltest',
-            'tag': '🔗 自动回退 🏁',
+            'tag': FALLBACK_TAG,
             'outbounds': ['🎯 全球直连'],
             'url': 'http://www.cloudflare.com/generate_204',
             'interval': '5m',
             'tolerance': 2
         }
-        for i, outbound in enumerate(config['outbounds']):
-            if outbound.get('tag') == '🧱仅专线🧱':
-                config['outbounds'].insert(i + 1, fallback_group)
-                changes_made.append("🔗 自动回退 🏁 已添加")
-                break
+        config['outbounds'].insert(anchor_index + 1, fallback_group)
+        changes_made.append("🔗 自动回退 🏁 已添加")
 
     # 7. 更新路由规则
     for rule in config['route']['rules']:
         if rule.get('rule_set') == 'surge-github':
-            rule['outbound'] = '🔗 自动回退 🏁'
+            rule['outbound'] = FALLBACK_TAG
             changes_made.append("surge-github 路由已更新")
         elif rule.get('rule_set') == 'surge-substore':
-            rule['outbound'] = '🔗 自动回退 🏁'
+            rule['outbound'] = FALLBACK_TAG
             changes_made.append("surge-substore 路由已更新")
 
     # 保存配置文件
-    with open('substore/Singbox_substore_1.13.0+.json', 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        with open(CONFIG_PATH, 'wb') as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    else:
+        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
 
     print("更新完成！")
     print("\n已完成的更改:")